@@ -5,38 +5,98 @@
 import json
 import logging
 import os
+import threading
 import time
-from datetime import datetime, timedelta
+from collections import OrderedDict
 from functools import wraps
-from typing import Any, AsyncGenerator, Callable, Optional, Union
+from typing import Any, AsyncGenerator, Callable, NamedTuple, Optional, Union
 
 from redis.asyncio import ConnectionPool, Redis
 from redis.exceptions import RedisError
 
 logger = logging.getLogger(__name__)
 
+CACHE_PURGE_INTERVAL = float(os.getenv("CACHE_PURGE_INTERVAL", "60"))
 
 cache: dict = {}
+_stats: dict = {}
+_lock = threading.Lock()
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+    size: int
+
+
+def _bucket(cache_name) -> OrderedDict:
+    bucket = cache.get(cache_name)
+    if bucket is None:
+        bucket = cache[cache_name] = OrderedDict()
+        _stats[cache_name] = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "purged_at": time.monotonic(),
+        }
+    return bucket
+
+
+def _purge(cache_name, now: float) -> None:
+    bucket = cache[cache_name]
+    expired = [key for key, entry in bucket.items() if entry["expires_at"] <= now]
+    for key in expired:
+        del bucket[key]
+    stats = _stats[cache_name]
+    stats["expirations"] += len(expired)
+    stats["purged_at"] = now
+
+
+def cached(cache_name, ttl_in_seconds, maxsize: Optional[int] = None):
+    """Memoize per arguments for ``ttl_in_seconds`` in the ``cache_name``
+    bucket. With ``maxsize`` the bucket keeps at most that many entries,
+    evicting the least recently used. Expired entries are dropped when read
+    and the whole bucket is swept at most every ``CACHE_PURGE_INTERVAL``
+    seconds (default 60) when a new value is stored.
+    """
+    if maxsize is not None and maxsize < 1:
+        raise ValueError("maxsize must be a positive integer or None")
 
-
-def cached(cache_name, ttl_in_seconds):
     def decorator(func):
         @wraps(func)
         def wrapper(*args, **kwargs):
             cache_key = tuple(args) + tuple(f"{k}={v}" for k, v in kwargs.items())
-            bucket = cache.get(cache_name, {})
 
-            if cache_key in bucket and bucket[cache_key]["expires_at"] > datetime.now():
-                logger.debug(f"Getting cached value from '{cache_name}:{cache_key}'")
-                return bucket[cache_key]["value"]
+            with _lock:
+                bucket = _bucket(cache_name)
+                stats = _stats[cache_name]
+                entry = bucket.get(cache_key)
+                if entry is not None:
+                    if entry["expires_at"] > time.monotonic():
+                        logger.debug(f"Getting cached value from '{cache_name}:{cache_key}'")
+                        bucket.move_to_end(cache_key)
+                        stats["hits"] += 1
+                        return entry["value"]
+                    del bucket[cache_key]
+                    stats["expirations"] += 1
+                stats["misses"] += 1
 
             result = func(*args, **kwargs)
 
-            cache[cache_name] = bucket
-            cache[cache_name][cache_key] = {
-                "value": result,
-                "expires_at": datetime.now() + timedelta(seconds=ttl_in_seconds),
-            }
+            with _lock:
+                bucket = _bucket(cache_name)
+                stats = _stats[cache_name]
+                now = time.monotonic()
+                if now - stats["purged_at"] >= CACHE_PURGE_INTERVAL:
+                    _purge(cache_name, now)
+                bucket[cache_key] = {"value": result, "expires_at": now + ttl_in_seconds}
+                bucket.move_to_end(cache_key)
+                while maxsize is not None and len(bucket) > maxsize:
+                    bucket.popitem(last=False)
+                    stats["evictions"] += 1
 
             return result
 
@@ -47,7 +107,38 @@ def cached(cache_name, ttl_in_seconds):
 
 def clear_cache(cache_name):
     logger.debug(f"Cleaning cache entry '{cache_name}'")
-    cache.pop(cache_name, None)
+    with _lock:
+        cache.pop(cache_name, None)
+        _stats.pop(cache_name, None)
+
+
+def purge_expired(cache_name=None) -> int:
+    """Drop expired entries from one bucket, or all; returns how many."""
+    with _lock:
+        names = list(cache) if cache_name is None else [cache_name]
+        now = time.monotonic()
+        before = sum(len(cache.get(name, ())) for name in names)
+        for name in names:
+            if name in cache:
+                _purge(name, now)
+        return before - sum(len(cache.get(name, ())) for name in names)
+
+
+def cache_info(cache_name) -> CacheInfo:
+    """Hits, misses, LRU evictions, expirations and current size of a bucket
+    since it was created or last cleared.
+    """
+    with _lock:
+        stats = _stats.get(cache_name)
+        if stats is None:
+            return CacheInfo(0, 0, 0, 0, 0)
+        return CacheInfo(
+            stats["hits"],
+            stats["misses"],
+            stats["evictions"],
+            stats["expirations"],
+            len(cache[cache_name]),
+        )
 
 
 _acache: dict = {}
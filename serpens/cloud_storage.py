@@ -16,3 +16,14 @@ def get_object(bucket, key):
     file_obj.seek(0)
 
     return file_obj
+
+
+def upload_object(data, bucket, key, content_type):
+    storage_client = storage.Client()
+
+    bucket = storage_client.bucket(bucket)
+
+    blob = bucket.blob(key)
+    blob.upload_from_string(data, content_type=content_type)
+
+    return True
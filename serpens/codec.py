@@ -0,0 +1,40 @@
+"""Opt-in compression for queue message bodies: ``gzip``, ``zlib`` and
+``zstd`` (when ``zstandard`` is installed). Publishers record the codec in the
+``serpens.encoding`` message attribute so consumers can reverse it.
+"""
+
+import gzip
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+ENCODING_ATTRIBUTE = "serpens.encoding"
+
+
+def _zstd():
+    if zstandard is None:
+        raise ValueError("zstd compression requires the 'zstandard' package")
+    return zstandard
+
+
+def compress(data: bytes, codec: str) -> bytes:
+    if codec == "gzip":
+        return gzip.compress(data)
+    if codec == "zlib":
+        return zlib.compress(data)
+    if codec == "zstd":
+        return _zstd().ZstdCompressor().compress(data)
+    raise ValueError(f"Unsupported compression codec {codec!r}")
+
+
+def decompress(data: bytes, codec: str) -> bytes:
+    if codec == "gzip":
+        return gzip.decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    if codec == "zstd":
+        return _zstd().ZstdDecompressor().decompress(data)
+    raise ValueError(f"Unsupported compression codec {codec!r}")
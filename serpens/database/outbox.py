@@ -0,0 +1,288 @@
+"""Transactional outbox over `serpens.database` and `serpens.messages`.
+
+Events are inserted into an outbox table in the same session as the business
+change, so they commit or roll back together. `OutboxRelay` drains the table
+afterwards: it locks a batch with ``FOR UPDATE SKIP LOCKED`` (so several
+relays can run side by side), publishes it and deletes what was sent.
+Delivery is at least once; consumers should be idempotent.
+Rows that keep failing are parked after ``max_attempts`` so they cannot block
+newer events.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+from sqlalchemy import JSON, BigInteger, DateTime, Integer, String, Text, delete, select, update
+from sqlalchemy.orm import Mapped, mapped_column
+
+from serpens.database.repository import AsyncRepository, Repository, T
+from serpens.schema import SchemaEncoder
+
+logger = logging.getLogger(__name__)
+
+__all__ = ["OutboxMixin", "OutboxRepository", "AsyncOutboxRepository", "OutboxRelay"]
+
+
+class OutboxMixin:
+    """Columns of an outbox table; combine with your own ``Base``:
+
+    class OutboxEvent(OutboxMixin, Base):
+        __tablename__ = "outbox_events"
+    """
+
+    id: Mapped[int] = mapped_column(
+        BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True
+    )
+    destination: Mapped[str] = mapped_column(String, nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)
+    order_key: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    attributes: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON, nullable=True)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.utcnow)
+
+
+def _event(
+    model: Type[T],
+    destination: str,
+    body: Any,
+    order_key: Optional[str] = None,
+    attributes: Optional[Dict[str, Any]] = None,
+) -> T:
+    return model(
+        destination=destination,
+        body=json.dumps(body, cls=SchemaEncoder),
+        order_key=order_key,
+        attributes=attributes,
+    )
+
+
+class OutboxRepository(Repository[T]):
+    """Writes events with the `MessageClient.publish` signature; they are
+    flushed with the session and sent by `OutboxRelay` after commit.
+    """
+
+    def enqueue(
+        self,
+        destination: str,
+        body: Any,
+        order_key: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> T:
+        return self.add(_event(self.model, destination, body, order_key, attributes), flush=False)
+
+    def enqueue_many(
+        self,
+        destination: str,
+        bodies: Iterable[Any],
+        order_key: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Sequence[T]:
+        events = (_event(self.model, destination, body, order_key, attributes) for body in bodies)
+        return self.bulk_add(events, flush=False)
+
+
+class AsyncOutboxRepository(AsyncRepository[T]):
+    async def enqueue(
+        self,
+        destination: str,
+        body: Any,
+        order_key: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> T:
+        event = _event(self.model, destination, body, order_key, attributes)
+        return await self.add(event, flush=False)
+
+    async def enqueue_many(
+        self,
+        destination: str,
+        bodies: Iterable[Any],
+        order_key: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> Sequence[T]:
+        events = (_event(self.model, destination, body, order_key, attributes) for body in bodies)
+        return await self.bulk_add(events, flush=False)
+
+
+def _failed_indexes(response: Any) -> set:
+    """Indexes SQS reported as ``Failed``; entry Ids are input indexes."""
+    responses = response if isinstance(response, list) else [response]
+    return {
+        int(failure["Id"])
+        for item in responses
+        if isinstance(item, dict)
+        for failure in item.get("Failed", [])
+    }
+
+
+class OutboxRelay:
+    """Publishes and deletes outbox rows in batches of ``batch_size``
+    (``OUTBOX_BATCH_SIZE``, default 100). Rows without an ``order_key`` go
+    out with one ``publish_batch`` per destination. Rows with one are
+    published one by one in id order, and the key stops at its first failure,
+    so nothing is delivered ahead of a row that will be retried. Rows whose
+    publish fails have ``attempts`` incremented and are retried on the next
+    pass; once they reach ``max_attempts`` (``OUTBOX_MAX_ATTEMPTS``, default
+    10) they are left in the table, skipped by the relay, for inspection.
+
+        relay = OutboxRelay(OutboxEvent)
+        relay.run()  # blocks; call relay.stop() from a SIGTERM handler
+    """
+
+    def __init__(
+        self,
+        model: Type[T],
+        client=None,
+        *,
+        batch_size: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        session_factory: Optional[Callable] = None,
+    ):
+        self.model = model
+        self.batch_size = batch_size or int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+        self.max_attempts = max_attempts or int(os.getenv("OUTBOX_MAX_ATTEMPTS", "10"))
+        self.poll_interval = (
+            poll_interval
+            if poll_interval is not None
+            else float(os.getenv("OUTBOX_POLL_INTERVAL", "1.0"))
+        )
+        self._client = client
+        self._session_factory = session_factory
+        self._stopping = threading.Event()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from serpens.messages import MessageClient
+
+            self._client = MessageClient.instance()
+        return self._client
+
+    def _session(self):
+        if self._session_factory is not None:
+            return self._session_factory()
+
+        from serpens.database import db_session
+
+        return db_session()
+
+    def _publish_in_order(self, destination: str, order_key: str, group: List[T]):
+        """Publish one row at a time, stopping at the first failure so later
+        rows of ``order_key`` are never delivered ahead of it.
+        """
+        sent = []
+        for index, row in enumerate(group):
+            try:
+                self.client.publish(destination, json.loads(row.body), order_key, row.attributes)
+            except Exception as error:
+                logger.error(
+                    "Outbox publish to %s failed for order key %s; holding back %d events: %s",
+                    destination,
+                    order_key,
+                    len(group) - index,
+                    error,
+                    exc_info=True,
+                )
+                return sent, [row]
+            sent.append(row.id)
+        return sent, []
+
+    def _publish_batch(self, destination: str, group: List[T]):
+        messages = [{"body": json.loads(row.body)} for row in group]
+        for message, row in zip(messages, group):
+            if row.attributes:
+                message["attributes"] = dict(row.attributes)
+        try:
+            failed = _failed_indexes(self.client.publish_batch(destination, messages))
+        except Exception as error:
+            logger.error(
+                "Outbox publish to %s failed for %d events: %s",
+                destination,
+                len(group),
+                error,
+                exc_info=True,
+            )
+            failed = set(range(len(group)))
+
+        if failed:
+            logger.warning(
+                "Outbox publish to %s rejected %d of %d events",
+                destination,
+                len(failed),
+                len(group),
+            )
+        sent = [row.id for index, row in enumerate(group) if index not in failed]
+        return sent, [row for index, row in enumerate(group) if index in failed]
+
+    def _publish(self, rows: List[T]) -> Tuple[List[int], List[T]]:
+        """Publish rows grouped by destination and order key, keeping their
+        order; returns the ids to delete and the rows that failed.
+        """
+        groups: Dict[tuple, List[T]] = {}
+        for row in rows:
+            groups.setdefault((row.destination, row.order_key), []).append(row)
+
+        sent, failed_rows = [], []
+        for (destination, order_key), group in groups.items():
+            if order_key:
+                group_sent, group_failed = self._publish_in_order(destination, order_key, group)
+            else:
+                group_sent, group_failed = self._publish_batch(destination, group)
+            sent.extend(group_sent)
+            failed_rows.extend(group_failed)
+        return sent, failed_rows
+
+    def relay_once(self) -> int:
+        """Relay one batch; returns the number of rows published."""
+        model = self.model
+        stmt = (
+            select(model)
+            .where(model.attempts < self.max_attempts)
+            .order_by(model.id)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        with self._session() as sess:
+            rows = list(sess.scalars(stmt).all())
+            if not rows:
+                return 0
+            sent, failed = self._publish(rows)
+            if sent:
+                sess.execute(delete(model).where(model.id.in_(sent)))
+            if failed:
+                sess.execute(
+                    update(model)
+                    .where(model.id.in_([row.id for row in failed]))
+                    .values(attempts=model.attempts + 1)
+                    .execution_options(synchronize_session=False)
+                )
+                for row in failed:
+                    if row.attempts + 1 >= self.max_attempts:
+                        logger.error(
+                            "Outbox event %s to %s parked after %d attempts",
+                            row.id,
+                            row.destination,
+                            self.max_attempts,
+                        )
+        return len(sent)
+
+    def run(self) -> None:
+        """Relay until `stop`; full batches are followed immediately by the
+        next one, otherwise the relay sleeps ``poll_interval`` seconds.
+        """
+        self._stopping.clear()
+        while not self._stopping.is_set():
+            try:
+                relayed = self.relay_once()
+            except Exception as error:
+                logger.error("Outbox relay pass failed: %s", error, exc_info=True)
+                relayed = 0
+            if relayed < self.batch_size:
+                self._stopping.wait(self.poll_interval)
+
+    def stop(self) -> None:
+        self._stopping.set()
@@ -0,0 +1,170 @@
+"""Idempotency stores for at-least-once consumers (`sqs.handler`,
+`sqs.async_handler`): processed message keys are remembered for a TTL so
+redeliveries are skipped before the handler runs.
+
+Every store keeps a bounded in-process LRU in front of its backend, so
+duplicates delivered to the same container never leave the process.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.exceptions import RedisError
+
+from serpens import cache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+DEFAULT_MAXSIZE = int(os.getenv("IDEMPOTENCY_LOCAL_MAXSIZE", "10000"))
+
+
+class IdempotencyStore:
+    """In-process store: LRU of ``maxsize`` keys, each kept ``ttl`` seconds.
+
+    Subclasses add a shared backend by overriding the ``_backend_*`` hooks
+    (and their async ``_abackend_*`` counterparts when the backend has an
+    async client).
+    """
+
+    def __init__(self, ttl: int = DEFAULT_TTL, maxsize: int = DEFAULT_MAXSIZE):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._local: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _local_seen(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._local.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.monotonic():
+                del self._local[key]
+                return False
+            self._local.move_to_end(key)
+            return True
+
+    def _local_add(self, key: str) -> None:
+        with self._lock:
+            self._local[key] = time.monotonic() + self.ttl
+            self._local.move_to_end(key)
+            while len(self._local) > self.maxsize:
+                self._local.popitem(last=False)
+
+    def _async_client(self) -> AsyncRedis:
+        # redis.asyncio connections are bound to the loop that opened them;
+        # clients of closed loops are dropped when a new loop shows up.
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None:
+            self._async_clients = {
+                other: client
+                for other, client in self._async_clients.items()
+                if not other.is_closed()
+            }
+            client = self._async_clients[loop] = AsyncRedis.from_url(
+                self.url or os.environ["REDIS_URL"]
+            )
+        return client
+
+    def _backend_seen(self, key: str) -> bool:
+        return False
+
+    def _backend_mark(self, key: str) -> None:
+        pass
+
+    async def _abackend_seen(self, key: str) -> bool:
+        return self._backend_seen(key)
+
+    async def _abackend_mark(self, key: str) -> None:
+        self._backend_mark(key)
+
+    def seen(self, key: str) -> bool:
+        if self._local_seen(key):
+            return True
+        if self._backend_seen(key):
+            self._local_add(key)
+            return True
+        return False
+
+    def mark(self, key: str) -> None:
+        self._local_add(key)
+        self._backend_mark(key)
+
+    async def aseen(self, key: str) -> bool:
+        if self._local_seen(key):
+            return True
+        if await self._abackend_seen(key):
+            self._local_add(key)
+            return True
+        return False
+
+    async def amark(self, key: str) -> None:
+        self._local_add(key)
+        await self._abackend_mark(key)
+
+
+class RedisIdempotencyStore(IdempotencyStore):
+    """Keys shared across containers in Redis, failing open on ``RedisError``.
+
+    Both paths open their own client from ``url`` / ``REDIS_URL`` (the async
+    one per event loop) and use the same ``CACHE_PREFIX``-scoped keys as
+    `serpens.cache`.
+    """
+
+    def __init__(
+        self,
+        ttl: int = DEFAULT_TTL,
+        maxsize: int = DEFAULT_MAXSIZE,
+        url: Optional[str] = None,
+        namespace: str = "idempotency",
+    ):
+        super().__init__(ttl=ttl, maxsize=maxsize)
+        self.url = url
+        self.namespace = namespace
+        self._client: Optional[Redis] = None
+        self._async_clients: dict = {}
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _sync_client(self) -> Redis:
+        if self._client is None:
+            self._client = Redis.from_url(self.url or os.environ["REDIS_URL"])
+        return self._client
+
+    def _backend_seen(self, key: str) -> bool:
+        try:
+            return self._sync_client().get(cache._redis_key(self._key(key))) is not None
+        except RedisError as exc:
+            logger.warning("idempotency redis GET failed for %s: %s", key, exc)
+            return False
+
+    def _backend_mark(self, key: str) -> None:
+        try:
+            self._sync_client().set(cache._redis_key(self._key(key)), json.dumps(1), ex=self.ttl)
+        except RedisError as exc:
+            logger.warning("idempotency redis SET failed for %s: %s", key, exc)
+
+    async def _abackend_seen(self, key: str) -> bool:
+        try:
+            return await self._async_client().get(cache._redis_key(self._key(key))) is not None
+        except RedisError as exc:
+            logger.warning("idempotency redis GET failed for %s: %s", key, exc)
+            return False
+
+    async def _abackend_mark(self, key: str) -> None:
+        try:
+            await self._async_client().set(
+                cache._redis_key(self._key(key)), json.dumps(1), ex=self.ttl
+            )
+        except RedisError as exc:
+            logger.warning("idempotency redis SET failed for %s: %s", key, exc)
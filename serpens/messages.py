@@ -1,9 +1,24 @@
+import asyncio
 import importlib
+import json
 import logging
 import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
 from enum import Enum
+from functools import wraps
 from typing import Any, Dict, List, Optional
 
+from serpens import metrics
+from serpens.schema import SchemaEncoder
+
+try:
+    from elasticapm import capture_span
+except ImportError:  # pragma: no cover
+    capture_span = None
+
 logger = logging.getLogger(__name__)
 
 
@@ -12,15 +27,303 @@ class MessageProvider(Enum):
     PUBSUB = "pubsub"
 
 
+class OutboxError(Exception):
+    """Buffered messages that could not be published: ``failures`` holds the
+    per-entry ``Failed`` items of a batch, ``errors`` the exception of each
+    failed batch when several destinations failed.
+    """
+
+    def __init__(self, message: str, failures=None, errors=None):
+        super().__init__(message)
+        self.failures = failures or []
+        self.errors = errors or []
+
+
+OUTBOX_MAX_MESSAGES = int(os.getenv("MESSAGES_OUTBOX_MAX_MESSAGES", "10"))
+
+_outbox: ContextVar[Optional["Outbox"]] = ContextVar("serpens_messages_outbox", default=None)
+
+
+class Outbox:
+    """Buffers `MessageClient.publish` / `apublish` calls made inside the
+    block and sends them with ``publish_batch``, one call per provider,
+    destination and ``order_key``. A destination is flushed as soon as it
+    buffers ``max_messages`` (``MESSAGES_OUTBOX_MAX_MESSAGES``, default 10)
+    and everything left is flushed on exit, also when the block raises, so
+    callers see the same messages go out as with direct publishes. Buffered
+    publishes return ``None`` instead of the provider response; failures
+    surface from the flush as the provider's exception or `OutboxError`,
+    after every destination has been attempted.
+
+        with messages.Outbox():
+            for item in items:
+                MessageClient.instance().publish(QUEUE_URL, item)
+
+    Use ``async with`` in coroutines to flush through ``apublish_batch``. The
+    buffer is shared with threads started via ``contextvars.copy_context``
+    (as `sqs.handler` does) and is thread-safe.
+    """
+
+    def __init__(self, max_messages: Optional[int] = None):
+        self.max_messages = max_messages or OUTBOX_MAX_MESSAGES
+        self._buffers: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+        self._token = None
+
+    def add(
+        self,
+        client: "MessageClient",
+        destination: str,
+        body: Any,
+        order_key: Optional[str] = None,
+        attributes: Optional[Dict[str, str]] = None,
+    ) -> Optional[tuple]:
+        """Buffer a message; returns the batch to send once it is full."""
+        key = (client._provider, destination, order_key)
+        message = {"body": body}
+        if attributes:
+            message["attributes"] = dict(attributes)
+
+        with self._lock:
+            _, buffer = self._buffers.setdefault(key, (client, []))
+            buffer.append(message)
+            if len(buffer) < self.max_messages:
+                return None
+            del self._buffers[key]
+        return client, destination, order_key, buffer
+
+    def _drain(self) -> List[tuple]:
+        with self._lock:
+            batches = [
+                (client, destination, order_key, buffer)
+                for (_, destination, order_key), (client, buffer) in self._buffers.items()
+            ]
+            self._buffers.clear()
+        return batches
+
+    @staticmethod
+    def _check(batch: tuple, response: Any) -> Any:
+        """Raise for per-entry failures SQS reports instead of raising."""
+        _, destination, _, messages = batch
+        responses = response if isinstance(response, list) else [response]
+        failures = [
+            failure
+            for item in responses
+            if isinstance(item, dict)
+            for failure in item.get("Failed", [])
+        ]
+        if failures:
+            raise OutboxError(
+                f"{len(failures)} of {len(messages)} messages to {destination} failed",
+                failures=failures,
+            )
+        return response
+
+    @classmethod
+    def send(cls, batch: tuple) -> Any:
+        client, destination, order_key, messages = batch
+        return cls._check(batch, client.publish_batch(destination, messages, order_key))
+
+    @classmethod
+    async def asend(cls, batch: tuple) -> Any:
+        client, destination, order_key, messages = batch
+        return cls._check(batch, await client.apublish_batch(destination, messages, order_key))
+
+    @staticmethod
+    def _raise(errors: List[Exception]) -> None:
+        if len(errors) == 1:
+            raise errors[0]
+        if errors:
+            raise OutboxError(f"{len(errors)} outbox batches failed", errors=errors)
+
+    def flush(self) -> None:
+        """Send every buffered batch, then raise if any of them failed."""
+        errors = []
+        for batch in self._drain():
+            try:
+                self.send(batch)
+            except Exception as error:
+                errors.append(error)
+        self._raise(errors)
+
+    async def aflush(self) -> None:
+        outcomes = await asyncio.gather(
+            *(self.asend(batch) for batch in self._drain()), return_exceptions=True
+        )
+        self._raise([outcome for outcome in outcomes if isinstance(outcome, Exception)])
+
+    def __enter__(self) -> "Outbox":
+        self._token = _outbox.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        # A failed flush is raised even when the block raised too; the block's
+        # exception stays attached as its context.
+        _outbox.reset(self._token)
+        self.flush()
+
+    async def __aenter__(self) -> "Outbox":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        _outbox.reset(self._token)
+        await self.aflush()
+
+
+def buffered(func=None, *, max_messages: Optional[int] = None):
+    """Run each call of ``func`` (sync or async) inside its own `Outbox`.
+    Stack it under ``api.handler`` / ``api.async_handler``, or over
+    ``sqs.handler`` to batch publishes across the whole SQS event.
+    """
+    if func is None:
+        return lambda f: buffered(f, max_messages=max_messages)
+
+    if asyncio.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with Outbox(max_messages):
+                return await func(*args, **kwargs)
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with Outbox(max_messages):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+def _body_size(body: Any) -> int:
+    if isinstance(body, bytes):
+        return len(body)
+    if not isinstance(body, str):
+        body = json.dumps(body, cls=SchemaEncoder)
+    return len(body.encode("utf-8"))
+
+
+def _error_name(error: Exception) -> str:
+    """botocore error code (e.g. ``RequestThrottled``) or the exception type."""
+    response = getattr(error, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        if code:
+            return code
+    return type(error).__name__
+
+
+def _failed_entries(response: Any) -> Dict[str, int]:
+    """Per-entry SQS failures counted by their ``Code``."""
+    responses = response if isinstance(response, list) else [response]
+    codes: Dict[str, int] = {}
+    for item in responses:
+        if isinstance(item, dict):
+            for failure in item.get("Failed", []):
+                code = failure.get("Code") or "EntryFailed"
+                codes[code] = codes.get(code, 0) + 1
+    return codes
+
+
 class MessageClient:
+    """Publishes through the provider selected by ``MESSAGE_PROVIDER``.
+
+    Every direct publish is recorded on ``metrics_sink`` (default: the sink set
+    with `serpens.metrics.set_sink`, none by default), tagged by provider,
+    destination and operation: ``messages.published``, ``messages.failures``
+    (tagged with the error or per-entry ``Code``, so throttling shows up as
+    e.g. ``RequestThrottled``) and ``messages.payload_bytes`` (serialized
+    bodies, before compression or claim check) counters, and the
+    ``messages.latency_ms`` histogram. SQS batches also record
+    ``messages.batch_fill_ratio``: entries per ``send_message_batch`` request
+    over ``sqs.MAX_BATCH_SIZE``.
+    With `elasticapm` installed each call also emits a messaging span.
+    """
+
     _instance = None
 
-    def __init__(self, provider: Optional[MessageProvider] = None):
+    def __init__(
+        self,
+        provider: Optional[MessageProvider] = None,
+        metrics_sink: Optional[metrics.MetricsSink] = None,
+    ):
         self._provider = provider or MessageProvider(os.getenv("MESSAGE_PROVIDER"))
         logger.debug(f"Provider: {self._provider.value}")
         module = importlib.import_module(f"serpens.{self._provider.value}")
+        self._module = module
+        self._metrics = metrics_sink
         self._publish = module.publish_message
         self._publish_batch = module.publish_message_batch
+        self._apublish = module.apublish_message
+        self._apublish_batch = module.apublish_message_batch
+
+    @staticmethod
+    def _response(response: Any) -> Dict[str, Any]:
+        if isinstance(response, str):
+            response = {"MessageId": response}
+
+        return response
+
+    @contextmanager
+    def _instrument(self, operation: str, destination: str, bodies: List[Any]):
+        """Yields a callback taking the provider response; records metrics
+        and wraps the call in an APM span when either is enabled.
+        """
+        sink = self._metrics or metrics.get_sink()
+        if sink is None and capture_span is None:
+            yield lambda response: None
+            return
+
+        tags = {
+            "provider": self._provider.value,
+            "destination": destination,
+            "operation": operation,
+        }
+        outcome = {"response": None}
+
+        def record(response: Any) -> None:
+            outcome["response"] = response
+
+        span = (
+            capture_span(
+                destination,
+                span_type="messaging",
+                span_subtype=self._provider.value,
+                span_action="send",
+                labels={"batch_size": len(bodies)},
+            )
+            if capture_span is not None
+            else None
+        )
+        started = time.perf_counter()
+        try:
+            if span is None:
+                yield record
+            else:
+                with span:
+                    yield record
+        except Exception as error:
+            if sink is not None:
+                sink.increment(
+                    "messages.failures", len(bodies), {**tags, "error": _error_name(error)}
+                )
+            raise
+        finally:
+            if sink is not None:
+                sink.observe("messages.latency_ms", (time.perf_counter() - started) * 1000, tags)
+
+        if sink is None:
+            return
+        response = outcome["response"]
+        failures = _failed_entries(response)
+        for code, count in failures.items():
+            sink.increment("messages.failures", count, {**tags, "error": code})
+        sink.increment("messages.published", len(bodies) - sum(failures.values()), tags)
+        sink.increment("messages.payload_bytes", sum(_body_size(body) for body in bodies), tags)
+        if self._provider.value == "sqs" and operation == "publish_batch" and response:
+            # One response per send_message_batch request.
+            capacity = len(response) * self._module.MAX_BATCH_SIZE
+            sink.observe("messages.batch_fill_ratio", len(bodies) / capacity, tags)
 
     def publish(
         self,
@@ -28,18 +331,57 @@ class MessageClient:
         body: Any,
         order_key: Optional[str] = None,
         attributes: Optional[Dict[str, str]] = None,
-    ) -> Dict[str, Any]:
-        response = self._publish(destination, body, order_key, attributes)
+    ) -> Optional[Dict[str, Any]]:
+        outbox = _outbox.get()
+        if outbox is not None:
+            batch = outbox.add(self, destination, body, order_key, attributes)
+            if batch is not None:
+                outbox.send(batch)
+            return None
 
-        if isinstance(response, str):
-            response = {"MessageId": response}
+        with self._instrument("publish", destination, [body]) as record:
+            response = self._publish(destination, body, order_key, attributes)
+            record(response)
+        return self._response(response)
 
+    def publish_batch(
+        self, destination: str, messages: List[Any], order_key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        bodies = [message.get("body") for message in messages]
+        with self._instrument("publish_batch", destination, bodies) as record:
+            response = self._publish_batch(destination, messages, order_key)
+            record(response)
         return response
 
-    def publish_batch(
+    async def apublish(
+        self,
+        destination: str,
+        body: Any,
+        order_key: Optional[str] = None,
+        attributes: Optional[Dict[str, str]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Non-blocking `publish`, sharing the provider's cached client."""
+        outbox = _outbox.get()
+        if outbox is not None:
+            batch = outbox.add(self, destination, body, order_key, attributes)
+            if batch is not None:
+                await outbox.asend(batch)
+            return None
+
+        with self._instrument("publish", destination, [body]) as record:
+            response = await self._apublish(destination, body, order_key, attributes)
+            record(response)
+        return self._response(response)
+
+    async def apublish_batch(
         self, destination: str, messages: List[Any], order_key: Optional[str] = None
     ) -> Dict[str, Any]:
-        return self._publish_batch(destination, messages, order_key)
+        """Non-blocking `publish_batch`, sharing the provider's cached client."""
+        bodies = [message.get("body") for message in messages]
+        with self._instrument("publish_batch", destination, bodies) as record:
+            response = await self._apublish_batch(destination, messages, order_key)
+            record(response)
+        return response
 
     @classmethod
     def instance(cls):
@@ -0,0 +1,113 @@
+"""Pluggable metrics sinks for serpens instrumentation (see `messages`).
+
+Nothing is recorded until a sink is installed with `set_sink`. Subclass
+`MetricsSink` to forward to StatsD, Prometheus or CloudWatch, or use
+`InMemoryMetricsSink` to inspect counters and histograms in-process.
+"""
+
+import bisect
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_sink: Optional["MetricsSink"] = None
+
+
+class MetricsSink:
+    """No-op base; override `increment` and `observe`."""
+
+    def increment(self, name: str, value: float = 1, tags: Optional[Dict[str, str]] = None):
+        pass
+
+    def observe(self, name: str, value: float, tags: Optional[Dict[str, str]] = None):
+        pass
+
+
+class Histogram:
+    """Cumulative bucket counts (upper bounds ``buckets`` plus ``+Inf``) with
+    count, sum, min and max.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+
+def _key(name: str, tags: Optional[Dict[str, str]]) -> Tuple[str, tuple]:
+    return name, tuple(sorted((tags or {}).items()))
+
+
+class InMemoryMetricsSink(MetricsSink):
+    """Thread-safe in-process sink, handy in tests and debug endpoints.
+
+    sink = InMemoryMetricsSink()
+    metrics.set_sink(sink)
+    ...
+    sink.counter("messages.published", destination=QUEUE_URL)
+    sink.histogram("messages.latency_ms", destination=QUEUE_URL).mean
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counters: Dict[tuple, float] = {}
+        self.histograms: Dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, tags: Optional[Dict[str, str]] = None):
+        key = _key(name, tags)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, tags: Optional[Dict[str, str]] = None):
+        key = _key(name, tags)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def counter(self, name: str, **tags) -> float:
+        """Sum of ``name`` over every series whose tags include ``tags``."""
+        wanted = set(tags.items())
+        with self._lock:
+            return sum(
+                value
+                for (key_name, key_tags), value in self.counters.items()
+                if key_name == name and wanted <= set(key_tags)
+            )
+
+    def histogram(self, name: str, **tags) -> Optional[Histogram]:
+        """The histogram of the series tagged exactly ``tags``."""
+        with self._lock:
+            return self.histograms.get(_key(name, tags))
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+def set_sink(sink: Optional[MetricsSink]) -> None:
+    """Install the process-wide sink; ``None`` turns recording off."""
+    global _sink
+    _sink = sink
+
+
+def get_sink() -> Optional[MetricsSink]:
+    return _sink
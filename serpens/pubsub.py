@@ -1,17 +1,32 @@
 import asyncio
+import atexit
+import base64
+import concurrent.futures
 import json
+import logging
+import os
+import re
+import threading
 from contextlib import contextmanager
-from typing import Any, Dict, List, Optional
+from functools import wraps
+from datetime import datetime
+from json import JSONDecodeError
+from typing import Any, Callable, Dict, List, Mapping, Optional, Union
+from uuid import uuid4
 
 from google.cloud import pubsub_v1
 
+from serpens import codec, elastic
 from serpens.schema import SchemaEncoder
+from serpens.sentry import FilteredEvent
 
 try:
     from elasticapm import capture_span
 except ImportError:  # pragma: no cover
     capture_span = None
 
+logger = logging.getLogger(__name__)
+
 
 @contextmanager
 def _messaging_span(topic: str):
@@ -22,17 +37,169 @@ def _messaging_span(topic: str):
         yield span
 
 
+# Deprecated: batch size now comes from `build_batch_settings`.
 MAX_BATCH_SIZE = 10
+MAX_MESSAGE_BYTES = 10 * 1000 * 1000
+MESSAGE_SIZE_MARGIN = 64 * 1024
+PAYLOAD_ATTRIBUTE = "serpens.payload"
+
+_clients: Dict[tuple, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def build_batch_settings(
+    max_messages: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    max_latency: Optional[float] = None,
+):
+    """Client-side batching tuned for throughput: up to 1000 messages / 9 MB
+    per publish RPC, waiting at most 10 ms. ``PUBSUB_BATCH_MAX_MESSAGES``,
+    ``PUBSUB_BATCH_MAX_BYTES`` and ``PUBSUB_BATCH_MAX_LATENCY`` override the
+    defaults; arguments override both.
+    """
+    if max_latency is None:
+        max_latency = float(os.getenv("PUBSUB_BATCH_MAX_LATENCY", "0.01"))
+    return pubsub_v1.types.BatchSettings(
+        max_messages=max_messages or int(os.getenv("PUBSUB_BATCH_MAX_MESSAGES", "1000")),
+        max_bytes=max_bytes or int(os.getenv("PUBSUB_BATCH_MAX_BYTES", "9000000")),
+        max_latency=max_latency,
+    )
 
 
-def publish_message(
+def build_flow_control(
+    message_limit: Optional[int] = None,
+    byte_limit: Optional[int] = None,
+    limit_exceeded_behavior: Optional[str] = None,
+):
+    """Publisher flow control: 10000 messages / 100 MB waiting to be sent,
+    enforced according to ``PUBSUB_FLOW_CONTROL_BEHAVIOR`` (``ignore``, the
+    SDK default, ``block`` or ``error``). Limits are overridable through
+    ``PUBSUB_FLOW_CONTROL_MAX_MESSAGES`` and ``PUBSUB_FLOW_CONTROL_MAX_BYTES``.
+    ``block`` stalls the publishing thread, so avoid it in event loops.
+    """
+    behavior = limit_exceeded_behavior or os.getenv("PUBSUB_FLOW_CONTROL_BEHAVIOR", "ignore")
+    return pubsub_v1.types.PublishFlowControl(
+        message_limit=message_limit or int(os.getenv("PUBSUB_FLOW_CONTROL_MAX_MESSAGES", "10000")),
+        byte_limit=byte_limit or int(os.getenv("PUBSUB_FLOW_CONTROL_MAX_BYTES", "100000000")),
+        limit_exceeded_behavior=pubsub_v1.types.LimitExceededBehavior(behavior),
+    )
+
+
+def _new_client(ordering: bool, batch_settings, flow_control):
+    publisher_options = pubsub_v1.types.PublisherOptions(
+        enable_message_ordering=ordering,
+        flow_control=flow_control or build_flow_control(),
+    )
+    return pubsub_v1.PublisherClient(
+        batch_settings=batch_settings or build_batch_settings(),
+        publisher_options=publisher_options,
+    )
+
+
+def get_client(ordering: bool = False, batch_settings=None, flow_control=None):
+    """Process-wide `PublisherClient` per (message ordering, batch settings,
+    flow control), defaulting to `build_batch_settings` / `build_flow_control`.
+
+    Reusing the client keeps its gRPC channel, credentials and client-side
+    batching alive between publishes. Clients are flushed and stopped at exit.
+    """
+    batch_settings = batch_settings or build_batch_settings()
+    flow_control = flow_control or build_flow_control()
+    key = (ordering, batch_settings, flow_control)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _new_client(ordering, batch_settings, flow_control)
+            _clients[key] = client
+    return client
+
+
+def reset_clients() -> None:
+    """Flush pending messages and stop every cached client."""
+    with _clients_lock:
+        clients = list(_clients.values())
+        _clients.clear()
+
+    for client in clients:
+        try:
+            client.stop()
+        except Exception as error:
+            logger.warning("Error stopping Pub/Sub publisher: %s", error)
+
+
+atexit.register(reset_clients)
+
+
+def _compress(data: bytes, attributes: Dict[str, Any], compression: Optional[str]) -> bytes:
+    compression = compression or os.getenv("PUBSUB_COMPRESSION")
+    if not compression:
+        return data
+
+    attributes[codec.ENCODING_ATTRIBUTE] = compression
+    return codec.compress(data, compression)
+
+
+def _message_size(data: bytes, attributes: Dict[str, Any]) -> int:
+    size = len(data)
+
+    for name, value in attributes.items():
+        size += len(name.encode("utf-8")) + len(str(value).encode("utf-8"))
+
+    return size
+
+
+def _claim_check(data: bytes, attributes: Dict[str, Any]) -> bytes:
+    """Store oversized data in Cloud Storage (``PUBSUB_PAYLOAD_BUCKET``) and
+    publish its ``gs://`` URI instead, flagged by the ``serpens.payload``
+    attribute. Consumers get the original bytes back via `decode_data`.
+
+    Data plus attributes is measured against ``MAX_MESSAGE_BYTES`` less
+    ``MESSAGE_SIZE_MARGIN``, which leaves room for the request overhead.
+    """
+    bucket = os.getenv("PUBSUB_PAYLOAD_BUCKET")
+    if not bucket or _message_size(data, attributes) <= MAX_MESSAGE_BYTES - MESSAGE_SIZE_MARGIN:
+        return data
+
+    from serpens import cloud_storage
+
+    key = f"{os.getenv('PUBSUB_PAYLOAD_PREFIX', 'pubsub-payloads')}/{uuid4()}"
+    cloud_storage.upload_object(data, bucket, key, "text/plain")
+    attributes[PAYLOAD_ATTRIBUTE] = "gcs"
+    return f"gs://{bucket}/{key}".encode("utf-8")
+
+
+def decode_data(data: bytes, attributes: Optional[Mapping[str, str]] = None) -> bytes:
+    """Consumer-side inverse of the publish helpers: returns the original
+    message bytes, downloading offloaded payloads from Cloud Storage and
+    decompressing bodies published with ``compression``.
+    """
+    attributes = attributes or {}
+
+    if attributes.get(PAYLOAD_ATTRIBUTE) == "gcs":
+        from serpens import cloud_storage
+
+        bucket, key = data.decode("utf-8")[len("gs://") :].split("/", 1)  # noqa: E203
+        data = cloud_storage.get_object(bucket, key).read()
+
+    encoding = attributes.get(codec.ENCODING_ATTRIBUTE)
+    if encoding:
+        data = codec.decompress(data, encoding)
+
+    return data
+
+
+def _enqueue_message(
     topic: str,
     data: Any,
-    ordering_key: str = "",
-    attributes: Optional[Dict[str, Any]] = None,
-) -> str:
-    publisher_options = pubsub_v1.types.PublisherOptions(enable_message_ordering=bool(ordering_key))
-    publisher = pubsub_v1.PublisherClient(publisher_options=publisher_options)
+    ordering_key: str,
+    attributes: Optional[Dict[str, Any]],
+    compression: Optional[str],
+):
+    publisher = get_client(ordering=bool(ordering_key))
 
     if not isinstance(data, str):
         data = json.dumps(data, cls=SchemaEncoder)
@@ -49,16 +216,71 @@ def publish_message(
     if ordering_key is None:
         ordering_key = ""
 
+    message = _compress(message, attributes, compression)
+    message = _claim_check(message, attributes)
+
     future = publisher.publish(topic, data=message, ordering_key=ordering_key, **attributes)
-    return future.result()
+    return publisher, topic, future, ordering_key
 
 
-def publish_message_batch(topic: str, messages: List[Dict], ordering_key: str = "") -> List[str]:
-    publisher_options = pubsub_v1.types.PublisherOptions(enable_message_ordering=bool(ordering_key))
-    batch_settings = pubsub_v1.types.BatchSettings(max_messages=MAX_BATCH_SIZE)
-    publisher = pubsub_v1.PublisherClient(
-        batch_settings=batch_settings, publisher_options=publisher_options
+def publish_message(
+    topic: str,
+    data: Any,
+    ordering_key: str = "",
+    attributes: Optional[Dict[str, Any]] = None,
+    compression: Optional[str] = None,
+) -> str:
+    publisher, topic, future, ordering_key = _enqueue_message(
+        topic, data, ordering_key, attributes, compression
     )
+    try:
+        return future.result()
+    except Exception:
+        _resume_publish(publisher, topic, [ordering_key])
+        raise
+
+
+async def apublish_message(
+    topic: str,
+    data: Any,
+    ordering_key: str = "",
+    attributes: Optional[Dict[str, Any]] = None,
+    compression: Optional[str] = None,
+) -> str:
+    """`publish_message` for event loops: encoding, claim check and the
+    client's ``publish`` (which blocks under ``block`` flow control) run on
+    the default executor, then the client's future is awaited.
+    """
+    publisher, topic, future, ordering_key = await asyncio.get_running_loop().run_in_executor(
+        None, _enqueue_message, topic, data, ordering_key, attributes, compression
+    )
+    try:
+        return await asyncio.wrap_future(future)
+    except Exception:
+        _resume_publish(publisher, topic, [ordering_key])
+        raise
+
+
+def _resume_publish(publisher, topic: str, ordering_keys) -> None:
+    """A failed publish pauses its ordering key client-side; resume it so the
+    next publish with that key is not rejected outright.
+    """
+    for ordering_key in set(ordering_keys):
+        if ordering_key:
+            publisher.resume_publish(topic, ordering_key)
+
+
+def _enqueue_batch(
+    topic: str,
+    messages: List[Dict],
+    ordering_key: str,
+    compression: Optional[str],
+):
+    if ordering_key is None:
+        ordering_key = ""
+
+    keys = [message.get("ordering_key") or ordering_key for message in messages]
+    publisher = get_client(ordering=any(keys))
 
     futures = []
     endpoint = None
@@ -66,10 +288,7 @@ def publish_message_batch(topic: str, messages: List[Dict], ordering_key: str =
     if ":" in topic:
         topic, endpoint = topic.split(":")
 
-    if ordering_key is None:
-        ordering_key = ""
-
-    for message in messages:
+    for message, key in zip(messages, keys):
         if not isinstance(message["body"], str):
             message["body"] = json.dumps(message["body"], cls=SchemaEncoder)
 
@@ -81,12 +300,63 @@ def publish_message_batch(topic: str, messages: List[Dict], ordering_key: str =
         if endpoint is not None:
             message["attributes"]["endpoint"] = endpoint
 
-        future = publisher.publish(
-            topic, data=body, ordering_key=ordering_key, **message["attributes"]
-        )
+        body = _compress(body, message["attributes"], compression)
+        body = _claim_check(body, message["attributes"])
+
+        future = publisher.publish(topic, data=body, ordering_key=key, **message["attributes"])
         futures.append(future)
 
-    return [f.result() for f in futures]
+    return publisher, topic, futures, keys
+
+
+def _batch_results(publisher, topic: str, outcomes: List[Any], keys: List[str]) -> List[str]:
+    failed = [
+        (outcome, key) for outcome, key in zip(outcomes, keys) if isinstance(outcome, Exception)
+    ]
+    if failed:
+        _resume_publish(publisher, topic, [key for _, key in failed])
+        raise failed[0][0]
+    return outcomes
+
+
+def _outcome(future) -> Any:
+    try:
+        return future.result()
+    except Exception as error:
+        return error
+
+
+def publish_message_batch(
+    topic: str,
+    messages: List[Dict],
+    ordering_key: str = "",
+    compression: Optional[str] = None,
+) -> List[str]:
+    """Publish ``{"body": ..., "attributes": {...}}`` messages and wait for
+    all of them. A message's own ``"ordering_key"`` overrides ``ordering_key``:
+    order is kept within each key while different keys publish in parallel.
+    If any publish fails, its key is resumed and the first error is raised.
+    """
+    publisher, topic, futures, keys = _enqueue_batch(topic, messages, ordering_key, compression)
+    return _batch_results(publisher, topic, [_outcome(future) for future in futures], keys)
+
+
+async def apublish_message_batch(
+    topic: str,
+    messages: List[Dict],
+    ordering_key: str = "",
+    compression: Optional[str] = None,
+) -> List[str]:
+    """`publish_message_batch` for event loops: enqueues on the default
+    executor, then gathers the futures.
+    """
+    publisher, topic, futures, keys = await asyncio.get_running_loop().run_in_executor(
+        None, _enqueue_batch, topic, messages, ordering_key, compression
+    )
+    outcomes = await asyncio.gather(
+        *(asyncio.wrap_future(future) for future in futures), return_exceptions=True
+    )
+    return _batch_results(publisher, topic, list(outcomes), keys)
 
 
 class AsyncPublisher:
@@ -94,16 +364,20 @@ class AsyncPublisher:
 
     `topic` is a full topic id (`projects/PROJECT/topics/NAME`) — the same
     value our Terraform exposes as an env var. Emits an `elasticapm`
-    messaging span per publish when APM is available.
+    messaging span per publish when APM is available. ``batch_settings`` and
+    ``flow_control`` default to `build_batch_settings` / `build_flow_control`.
     """
 
-    def __init__(self, ordering_key: str = ""):
-        publisher_options = pubsub_v1.types.PublisherOptions(
-            enable_message_ordering=bool(ordering_key)
-        )
-        self._client = pubsub_v1.PublisherClient(publisher_options=publisher_options)
+    def __init__(self, ordering_key: str = "", batch_settings=None, flow_control=None):
+        self._client = _new_client(bool(ordering_key), batch_settings, flow_control)
         self._ordering_key = ordering_key
 
+    @staticmethod
+    def _encode(data: Any) -> bytes:
+        if not isinstance(data, str):
+            data = json.dumps(data, cls=SchemaEncoder)
+        return data.encode("utf-8")
+
     async def publish(
         self,
         topic: str,
@@ -111,9 +385,7 @@ class AsyncPublisher:
         ordering_key: Optional[str] = None,
         attributes: Optional[Dict[str, Any]] = None,
     ) -> str:
-        if not isinstance(data, str):
-            data = json.dumps(data, cls=SchemaEncoder)
-        message = data.encode("utf-8")
+        message = self._encode(data)
 
         if attributes is None:
             attributes = {}
@@ -131,5 +403,356 @@ class AsyncPublisher:
                 span.label(queue_name=topic)
             return message_id
 
+    async def publish_many(
+        self,
+        topic: str,
+        messages: List[Dict[str, Any]],
+        ordering_key: Optional[str] = None,
+    ) -> List[str]:
+        """Publish ``{"body": ..., "attributes": {...}}`` messages in one go.
+
+        Every message is handed to the client's batcher before anything is
+        awaited, so they share publish RPCs; returns message ids in input
+        order and emits a single span for the whole batch.
+        """
+        endpoint = None
+        if ":" in topic:
+            topic, endpoint = topic.split(":")
+
+        key = self._ordering_key if ordering_key is None else ordering_key
+
+        with _messaging_span(topic) as span:
+            futures = []
+            for message in messages:
+                attributes = dict(message.get("attributes") or {})
+                if endpoint is not None:
+                    attributes["endpoint"] = endpoint
+                data = self._encode(message["body"])
+                future = self._client.publish(topic, data=data, ordering_key=key, **attributes)
+                futures.append(asyncio.wrap_future(future))
+
+            message_ids = list(await asyncio.gather(*futures))
+            if span is not None and hasattr(span, "label"):
+                span.label(queue_name=topic, batch_size=len(messages))
+            return message_ids
+
     def close(self) -> None:
         self._client.transport.close()
+
+
+_UNSET = object()
+
+
+class Record:
+    """Pub/Sub message handed to `Subscriber` handlers. ``body`` goes through
+    `decode_data` and is parsed as JSON (falling back to text) on first
+    access, then cached, like `sqs.Record`.
+    """
+
+    __slots__ = ("message", "attributes", "_body")
+
+    def __init__(self, message):
+        self.message = message
+        self.attributes = dict(message.attributes)
+        self._body = _UNSET
+
+    @property
+    def message_id(self) -> str:
+        return self.message.message_id
+
+    @property
+    def ordering_key(self) -> str:
+        return self.message.ordering_key
+
+    @property
+    def publish_time(self) -> datetime:
+        return self.message.publish_time
+
+    @property
+    def delivery_attempt(self) -> Optional[int]:
+        return self.message.delivery_attempt
+
+    @property
+    def body(self) -> Union[dict, str]:
+        if self._body is _UNSET:
+            self._body = self._decode_body()
+        return self._body
+
+    def _decode_body(self) -> Union[dict, str]:
+        body_raw = decode_data(self.message.data, self.attributes).decode("utf-8")
+
+        try:
+            return json.loads(body_raw)
+
+        except JSONDecodeError:
+            return body_raw
+
+
+def _handle_error(error: Exception, record: Record, subscription: Optional[str]) -> None:
+    """Report a handler error; must be called from its ``except`` block."""
+    elastic.capture_exception(error)
+
+    if isinstance(error, FilteredEvent):
+        logger.warning(
+            "Filtered event while processing message %s on %s: %s",
+            record.message_id,
+            subscription,
+            error,
+            exc_info=True,
+        )
+    else:
+        logger.error(
+            "Error processing message %s on %s: %s",
+            record.message_id,
+            subscription,
+            error,
+            exc_info=True,
+        )
+
+
+class Subscriber:
+    """Streaming-pull consumer for Cloud Run / GKE workers.
+
+    ``func`` gets a `Record` per message: returning acks it, raising nacks it
+    for redelivery. As in `sqs.handler`, a `FilteredEvent` is logged as a
+    warning and anything else as an error; both are sent to APM. Flow control
+    caps the messages leased at once (``max_messages`` / ``max_bytes``, or
+    ``PUBSUB_SUBSCRIBER_MAX_MESSAGES`` / ``PUBSUB_SUBSCRIBER_MAX_BYTES``).
+    Sync handlers run on ``max_workers`` threads; coroutine handlers run on a
+    dedicated event loop, bounded only by flow control.
+
+        subscriber = pubsub.Subscriber(SUBSCRIPTION, process, max_workers=16)
+        subscriber.run()  # blocks; call subscriber.stop() from a SIGTERM handler
+    """
+
+    def __init__(
+        self,
+        subscription: str,
+        func: Callable[[Record], Any],
+        *,
+        max_messages: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_workers: int = 10,
+    ):
+        self.subscription = subscription
+        self.func = func
+        self.max_workers = max_workers
+        self.flow_control = pubsub_v1.types.FlowControl(
+            max_messages=max_messages or int(os.getenv("PUBSUB_SUBSCRIBER_MAX_MESSAGES", "1000")),
+            max_bytes=max_bytes or int(os.getenv("PUBSUB_SUBSCRIBER_MAX_BYTES", "104857600")),
+        )
+
+        self._is_async = asyncio.iscoroutinefunction(func)
+        self._client = None
+        self._future = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._pending: set = set()
+        self._pending_lock = threading.Lock()
+        self._stopped = False
+        self._draining = False
+
+    def start(self) -> None:
+        self._client = pubsub_v1.SubscriberClient()
+
+        if self._is_async:
+            self._loop = asyncio.new_event_loop()
+            self._loop_thread = threading.Thread(
+                target=self._loop.run_forever, name="pubsub-subscriber-loop", daemon=True
+            )
+            self._loop_thread.start()
+            callback, scheduler = self._submit, None
+        else:
+            executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="pubsub-worker"
+            )
+            callback = self._process
+            scheduler = pubsub_v1.subscriber.scheduler.ThreadScheduler(executor=executor)
+
+        self._future = self._client.subscribe(
+            self.subscription,
+            callback,
+            flow_control=self.flow_control,
+            scheduler=scheduler,
+            await_callbacks_on_shutdown=True,
+        )
+        logger.info("Pub/Sub subscriber started on %s", self.subscription)
+
+    def stop(self) -> None:
+        """Stop pulling, wait for running handlers and close the client."""
+        if self._stopped or self._future is None:
+            return
+        self._stopped = True
+
+        if self._loop is not None:
+            # Coroutines outlive their callbacks, so wait for them while the
+            # stream is still open to carry their acks; new messages are nacked.
+            with self._pending_lock:
+                self._draining = True
+                pending = list(self._pending)
+            concurrent.futures.wait(pending)
+
+        self._future.cancel()
+        try:
+            self._future.result()
+        except Exception as error:
+            logger.warning("Streaming pull on %s ended with %s", self.subscription, error)
+
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._loop_thread.join()
+            self._loop.close()
+
+        self._client.close()
+        logger.info("Pub/Sub subscriber stopped on %s", self.subscription)
+
+    def run(self) -> None:
+        """Start and block until `stop` is called or the stream fails."""
+        self.start()
+        try:
+            self._future.result()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def _process(self, message) -> None:
+        record = Record(message)
+        try:
+            self.func(record)
+        except Exception as error:
+            _handle_error(error, record, self.subscription)
+            message.nack()
+            return
+        message.ack()
+
+    async def _aprocess(self, message) -> None:
+        record = Record(message)
+        try:
+            await self.func(record)
+        except Exception as error:
+            _handle_error(error, record, self.subscription)
+            message.nack()
+            return
+        message.ack()
+
+    def _submit(self, message) -> None:
+        with self._pending_lock:
+            if self._draining:
+                message.nack()
+                return
+            future = asyncio.run_coroutine_threadsafe(self._aprocess(message), self._loop)
+            self._pending.add(future)
+        future.add_done_callback(self._discard)
+
+    def _discard(self, future) -> None:
+        with self._pending_lock:
+            self._pending.discard(future)
+
+
+ACK_RESPONSE = (204, "")
+
+
+def _parse_publish_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    value = re.sub(r"\.(\d+)", lambda match: "." + match.group(1)[:6].ljust(6, "0"), value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class _PushMessage:
+    """Push-envelope counterpart of the streaming-pull message wrapped by
+    `Record`; ``data`` is base64-decoded only when the body is read.
+    """
+
+    __slots__ = ("envelope", "payload", "_data")
+
+    def __init__(self, envelope: Dict[str, Any]):
+        self.envelope = envelope
+        self.payload = envelope["message"]
+        self._data = _UNSET
+
+    @property
+    def attributes(self) -> Dict[str, str]:
+        return self.payload.get("attributes") or {}
+
+    @property
+    def message_id(self) -> Optional[str]:
+        return self.payload.get("messageId") or self.payload.get("message_id")
+
+    @property
+    def ordering_key(self) -> str:
+        return self.payload.get("orderingKey", "")
+
+    @property
+    def publish_time(self) -> Optional[datetime]:
+        return _parse_publish_time(self.payload.get("publishTime"))
+
+    @property
+    def delivery_attempt(self) -> Optional[int]:
+        return self.envelope.get("deliveryAttempt")
+
+    @property
+    def data(self) -> bytes:
+        if self._data is _UNSET:
+            self._data = base64.b64decode(self.payload.get("data", ""))
+        return self._data
+
+
+def _push_record(request: Any) -> Optional[Record]:
+    envelope = getattr(request, "body", request)
+    try:
+        if isinstance(envelope, (bytes, str)):
+            envelope = json.loads(envelope)
+        return Record(_PushMessage(envelope))
+    except (JSONDecodeError, KeyError, TypeError, AttributeError) as error:
+        logger.warning("Invalid Pub/Sub push envelope: %s", error)
+        return None
+
+
+def _push_error(error: Exception, record: Record):
+    _handle_error(error, record, record.message.envelope.get("subscription"))
+    return 500, {"message": str(error)}
+
+
+def push_handler(func: Callable[[Record], Any]):
+    """Handle Pub/Sub push deliveries (Cloud Run, Cloud Functions).
+
+    Accepts the push envelope as an `api.Request`, a parsed dict or raw JSON,
+    and calls ``func`` with a `Record`. Returns a ``(status, body)`` tuple
+    `api.handler` / `api.async_handler` understand: ``204`` acks the message,
+    ``500`` nacks it after logging like `Subscriber`, and ``400`` rejects a
+    malformed envelope. Works with both ``def`` and ``async def`` handlers.
+
+        @api.async_handler
+        @pubsub.push_handler
+        async def lambda_handler(record: pubsub.Record):
+            ...
+    """
+    if asyncio.iscoroutinefunction(func):
+
+        @wraps(func)
+        async def async_wrapper(request):
+            record = _push_record(request)
+            if record is None:
+                return 400, {"message": "Invalid Pub/Sub push envelope"}
+            try:
+                await func(record)
+            except Exception as error:
+                return _push_error(error, record)
+            return ACK_RESPONSE
+
+        return async_wrapper
+
+    @wraps(func)
+    def wrapper(request):
+        record = _push_record(request)
+        if record is None:
+            return 400, {"message": "Invalid Pub/Sub push envelope"}
+        try:
+            func(record)
+        except Exception as error:
+            return _push_error(error, record)
+        return ACK_RESPONSE
+
+    return wrapper
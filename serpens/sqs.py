@@ -1,16 +1,26 @@
+import asyncio
+import base64
+import contextvars
 import json
 import logging
 import numbers
 import os
+import queue
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from functools import wraps
+from functools import partial, wraps
 from json.decoder import JSONDecodeError
-from typing import Any, Dict, Union
+from typing import Any, Callable, Dict, Optional, Union
+from urllib.parse import urlparse
 from uuid import uuid4
 
 import boto3
+from botocore.config import Config
 
-from serpens import elastic, initializers
+from serpens import codec, elastic, initializers, s3
 from serpens.schema import SchemaEncoder
 from serpens.sentry import FilteredEvent
 
@@ -19,12 +29,50 @@ initializers.setup()
 logger = logging.getLogger(__name__)
 
 MAX_BATCH_SIZE = 10
+MAX_BATCH_BYTES = 256 * 1024
+MAX_MESSAGE_BYTES = 256 * 1024
+PAYLOAD_ATTRIBUTE = "serpens.payload"
+
+_clients: Dict[tuple, Any] = {}
+_clients_lock = threading.Lock()
 
 
 def get_cloud_provider():
     return os.getenv("CLOUD_PROVIDER", "aws")
 
 
+def get_client(region_name: Optional[str] = None, endpoint_url: Optional[str] = None):
+    """Process-wide SQS client per (region, endpoint), shared by all publishers.
+
+    boto3 clients are thread-safe once built; only creation goes through the
+    lock. Pool size and keep-alive come from ``SQS_MAX_POOL_CONNECTIONS`` and
+    ``SQS_TCP_KEEPALIVE``.
+    """
+    key = (region_name, endpoint_url)
+    client = _clients.get(key)
+    if client is not None:
+        return client
+
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            keepalive = os.getenv("SQS_TCP_KEEPALIVE", "true").lower() in ("1", "true", "yes")
+            config = Config(
+                max_pool_connections=int(os.getenv("SQS_MAX_POOL_CONNECTIONS", "50")),
+                tcp_keepalive=keepalive,
+            )
+            client = boto3.client(
+                "sqs", region_name=region_name, endpoint_url=endpoint_url, config=config
+            )
+            _clients[key] = client
+    return client
+
+
+def reset_clients() -> None:
+    with _clients_lock:
+        _clients.clear()
+
+
 def build_message_attributes(attributes):
     message_attributes = {}
 
@@ -41,50 +89,204 @@ def build_message_attributes(attributes):
     return message_attributes
 
 
-def publish_message_batch(queue_url, messages, order_key=None):
-    message_group_id = order_key
-    client = boto3.client("sqs")
-    entries = []
-    result = []
+def _build_entry(message, index, compression=None, claim_check=True):
+    body = message["body"] or {}
+    if not isinstance(body, str):
+        body = json.dumps(body, cls=SchemaEncoder)
 
-    params = {"QueueUrl": queue_url}
+    entry = {"Id": str(index), "MessageBody": body}
 
-    if queue_url.endswith(".fifo"):
-        params["MessageGroupId"] = message_group_id
-        params["MessageDeduplicationId"] = message_group_id
+    message_attributes = build_message_attributes(message.get("attributes", {}))
 
-    for message in messages:
-        message_attributes = {}
+    if message_attributes:
+        entry["MessageAttributes"] = message_attributes
 
-        body = message["body"] or {}
-        if not isinstance(body, str):
-            body = json.dumps(body, cls=SchemaEncoder)
+    _compress(entry, compression)
+    if claim_check:
+        _claim_check(entry)
 
-        entry = {"Id": str(uuid4()), "MessageBody": body}
+    return entry
 
-        message_attributes = build_message_attributes(message.get("attributes", {}))
 
-        if message_attributes:
-            entry["MessageAttributes"] = message_attributes
+def _entry_size(entry) -> int:
+    size = len(entry["MessageBody"].encode("utf-8"))
 
-        entries.append(entry)
+    for name, attribute in entry.get("MessageAttributes", {}).items():
+        size += len(name.encode("utf-8")) + len(attribute["DataType"].encode("utf-8"))
+        if "BinaryValue" in attribute:
+            size += len(attribute["BinaryValue"])
+        else:
+            size += len(str(attribute["StringValue"]).encode("utf-8"))
 
-        if len(entries) == MAX_BATCH_SIZE:
-            params["Entries"] = entries
-            sent_message = client.send_message_batch(**params)
-            result.append(sent_message)
-            entries = []
+    return size
 
-    if entries:
-        params["Entries"] = entries
-        sent_message = client.send_message_batch(**params)
-        result.append(sent_message)
 
-    return result
+def _compress(entry, compression: Optional[str]) -> None:
+    """Compress the body with ``compression`` (default ``SQS_COMPRESSION``) and
+    base64 it, since SQS bodies must be text. The codec travels in the
+    ``serpens.encoding`` attribute and ``Record.body`` reverses it.
+    """
+    compression = compression or os.getenv("SQS_COMPRESSION")
+    if not compression:
+        return
+
+    data = codec.compress(entry["MessageBody"].encode("utf-8"), compression)
+    entry["MessageBody"] = base64.b64encode(data).decode("ascii")
+    entry.setdefault("MessageAttributes", {})[codec.ENCODING_ATTRIBUTE] = {
+        "StringValue": compression,
+        "DataType": "String",
+    }
+
+
+def _oversized(entry) -> bool:
+    return bool(os.getenv("SQS_PAYLOAD_BUCKET")) and _entry_size(entry) > MAX_MESSAGE_BYTES
+
+
+def _claim_check(entry) -> None:
+    """Store an oversized body in S3 (``SQS_PAYLOAD_BUCKET``) and send its
+    ``s3://`` URI instead, flagged by the ``serpens.payload`` attribute.
+    ``Record.body`` downloads it back on first access.
+    """
+    if not _oversized(entry):
+        return
+
+    bucket = os.getenv("SQS_PAYLOAD_BUCKET")
+
+    key = f"{os.getenv('SQS_PAYLOAD_PREFIX', 'sqs-payloads')}/{uuid4()}"
+    if not s3.upload_object(entry["MessageBody"].encode("utf-8"), bucket, key, "text/plain"):
+        raise RuntimeError(f"Unable to offload message body to s3://{bucket}/{key}")
+
+    entry["MessageBody"] = f"s3://{bucket}/{key}"
+    entry.setdefault("MessageAttributes", {})[PAYLOAD_ATTRIBUTE] = {
+        "StringValue": "s3",
+        "DataType": "String",
+    }
+
+
+def _load_payload(uri: str) -> str:
+    bucket, key = uri[len("s3://") :].split("/", 1)  # noqa: E203
+    stream = s3.get_object(bucket, key)
+    if stream is None:
+        raise LookupError(f"Message payload {uri} not found")
+    return stream.read().decode("utf-8")
+
+
+def _batches(entries):
+    """Greedily pack entries, in order, up to ``MAX_BATCH_SIZE`` entries and
+    ``MAX_BATCH_BYTES`` of payload (bodies plus attributes) per request.
+    """
+    batch = []
+    batch_size = 0
 
+    for entry in entries:
+        size = _entry_size(entry)
 
-def publish_message(queue_url, body, message_group_id=None, attributes=None):
-    client = boto3.client("sqs")
+        if batch and (len(batch) == MAX_BATCH_SIZE or batch_size + size > MAX_BATCH_BYTES):
+            yield batch
+            batch = []
+            batch_size = 0
+
+        batch.append(entry)
+        batch_size += size
+
+    if batch:
+        yield batch
+
+
+def _backoff(attempt: int) -> float:
+    base = float(os.getenv("SQS_BATCH_RETRY_BASE_DELAY", "0.1"))
+    cap = float(os.getenv("SQS_BATCH_RETRY_MAX_DELAY", "5"))
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+
+def _send_batch(client, params, batch, max_attempts):
+    """Send one batch, re-sending only the entries that failed on the server
+    side (``SenderFault`` false) with exponential backoff and full jitter.
+    Returns a single response whose ``Successful``/``Failed`` lists hold the
+    final outcome of every entry.
+    """
+    pending = {entry["Id"]: entry for entry in batch}
+    successful = []
+    failed = []
+
+    for attempt in range(1, max_attempts + 1):
+        response = client.send_message_batch(**params, Entries=list(pending.values()))
+        successful.extend(response.get("Successful", []))
+
+        retryable = []
+        for failure in response.get("Failed", []):
+            if failure.get("SenderFault") or failure.get("Id") not in pending:
+                failed.append(failure)
+            elif attempt == max_attempts:
+                failed.append(failure)
+            else:
+                retryable.append(failure["Id"])
+
+        if not retryable:
+            break
+
+        logger.warning(
+            "Retrying %d failed entries on %s (attempt %d of %d)",
+            len(retryable),
+            params["QueueUrl"],
+            attempt + 1,
+            max_attempts,
+        )
+        pending = {entry_id: pending[entry_id] for entry_id in retryable}
+        time.sleep(_backoff(attempt))
+
+    return {**response, "Successful": successful, "Failed": failed}
+
+
+def publish_message_batch(
+    queue_url, messages, order_key=None, max_workers=None, max_attempts=None, compression=None
+):
+    """Send ``messages`` in as few requests as the entry count and payload size
+    limits allow, one response per request.
+
+    Each entry ``Id`` is the message index in ``messages``, so the final
+    ``Successful``/``Failed`` lists map back to the input. Entries that fail
+    server-side are retried up to ``max_attempts`` times (default
+    ``SQS_BATCH_MAX_ATTEMPTS``, else ``3``). ``compression`` names a
+    `serpens.codec` codec applied to every body.
+
+    With ``max_workers > 1`` (default ``SQS_BATCH_MAX_WORKERS``, else ``1``)
+    requests of a standard queue are sent concurrently, at most ``max_workers``
+    in flight. On FIFO queues every entry carries ``order_key`` as its
+    ``MessageGroupId`` and its own ``MessageDeduplicationId``, and requests
+    are always sent in order. Responses keep the input order.
+    """
+    if max_attempts is None:
+        max_attempts = int(os.getenv("SQS_BATCH_MAX_ATTEMPTS", "3"))
+    if max_attempts < 1:
+        raise ValueError("max_attempts must be at least 1")
+
+    client = get_client()
+
+    params = {"QueueUrl": queue_url}
+
+    entries = [_build_entry(message, index, compression) for index, message in enumerate(messages)]
+    if queue_url.endswith(".fifo") and order_key:
+        for entry in entries:
+            entry["MessageGroupId"] = order_key
+            entry["MessageDeduplicationId"] = str(uuid4())
+    batches = list(_batches(entries))
+
+    def send(batch):
+        return _send_batch(client, params, batch, max_attempts)
+
+    if max_workers is None:
+        max_workers = int(os.getenv("SQS_BATCH_MAX_WORKERS", "1"))
+
+    if queue_url.endswith(".fifo") or max_workers <= 1 or len(batches) <= 1:
+        return [send(batch) for batch in batches]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as executor:
+        return list(executor.map(send, batches))
+
+
+def publish_message(queue_url, body, message_group_id=None, attributes=None, compression=None):
+    client = get_client()
 
     if not isinstance(body, str):
         body = json.dumps(body, cls=SchemaEncoder)
@@ -102,56 +304,567 @@ def publish_message(queue_url, body, message_group_id=None, attributes=None):
         params["MessageGroupId"] = message_group_id
         params["MessageDeduplicationId"] = message_group_id
 
+    _compress(params, compression)
+    _claim_check(params)
+
     return client.send_message(**params)
 
 
-def handler(func):
+async def apublish_message(
+    queue_url, body, message_group_id=None, attributes=None, compression=None
+):
+    """`publish_message` for event loops: the boto3 call runs on the loop's
+    default executor with the shared cached client.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, partial(publish_message, queue_url, body, message_group_id, attributes, compression)
+    )
+
+
+async def apublish_message_batch(
+    queue_url, messages, order_key=None, max_workers=None, max_attempts=None, compression=None
+):
+    """`publish_message_batch` for event loops, run on the default executor."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None,
+        partial(
+            publish_message_batch,
+            queue_url,
+            messages,
+            order_key,
+            max_workers,
+            max_attempts,
+            compression,
+        ),
+    )
+
+
+class PublishError(Exception):
+    """An entry SQS rejected after all retries; ``failure`` is the raw
+    ``Failed`` item from ``send_message_batch``.
+    """
+
+    def __init__(self, failure: Dict[str, Any]):
+        super().__init__(f"{failure.get('Code')}: {failure.get('Message')}")
+        self.failure = failure
+
+
+class AsyncSQSPublisher:
+    """Async micro-batching publisher for FastAPI / asyncio apps, the SQS
+    counterpart of `serpens.pubsub.AsyncPublisher`.
+
+    Messages are buffered per queue (and FIFO ``message_group_id``) and sent
+    with ``send_message_batch`` on a worker thread as soon as 10 entries or
+    ``MAX_BATCH_BYTES`` are buffered, or ``linger_ms`` after the first one.
+    Each ``await publish(...)`` resolves to its own ``MessageId`` or raises
+    `PublishError`. Instantiate once per process and ``await close()`` on
+    shutdown to flush what is still buffered.
+    """
+
+    def __init__(
+        self,
+        linger_ms: float = 10,
+        max_attempts: Optional[int] = None,
+        compression: Optional[str] = None,
+    ):
+        self._client = get_client()
+        self._linger = linger_ms / 1000
+        self._max_attempts = max_attempts or int(os.getenv("SQS_BATCH_MAX_ATTEMPTS", "3"))
+        self._compression = compression
+        self._buffers: Dict[tuple, list] = {}
+        self._sizes: Dict[tuple, int] = {}
+        self._timers: Dict[tuple, asyncio.TimerHandle] = {}
+        self._locks: Dict[tuple, list] = {}
+        self._tasks: set = set()
+
+    async def publish(
+        self,
+        queue_url: str,
+        body: Any,
+        message_group_id: Optional[str] = None,
+        attributes: Optional[Dict[str, Any]] = None,
+    ) -> str:
+        message = {"body": body, "attributes": attributes or {}}
+        entry = _build_entry(message, 0, self._compression, claim_check=False)
+        if _oversized(entry):
+            # The S3 upload must not block the event loop.
+            await asyncio.get_running_loop().run_in_executor(None, _claim_check, entry)
+
+        if queue_url.endswith(".fifo"):
+            # Entries of one group share a request, so each needs its own
+            # deduplication id or SQS keeps only the first.
+            entry["MessageGroupId"] = message_group_id
+            entry["MessageDeduplicationId"] = str(uuid4())
+
+        key = (queue_url, message_group_id if queue_url.endswith(".fifo") else None)
+        size = _entry_size(entry)
+        if self._buffers.get(key) and self._sizes[key] + size > MAX_BATCH_BYTES:
+            self._flush(key)
+
+        future = asyncio.get_running_loop().create_future()
+        buffer = self._buffers.setdefault(key, [])
+        buffer.append((entry, future))
+        self._sizes[key] = self._sizes.get(key, 0) + size
+
+        if len(buffer) == MAX_BATCH_SIZE:
+            self._flush(key)
+        elif len(buffer) == 1:
+            self._timers[key] = asyncio.get_running_loop().call_later(
+                self._linger, self._flush, key
+            )
+
+        return await future
+
+    def _flush(self, key: tuple) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        items = self._buffers.pop(key, [])
+        self._sizes.pop(key, None)
+        if not items:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._send(key, items))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _request(self, queue_url: str, entries: list) -> Dict[str, Any]:
+        send = partial(
+            _send_batch, self._client, {"QueueUrl": queue_url}, entries, self._max_attempts
+        )
+        return await asyncio.get_running_loop().run_in_executor(None, send)
+
+    async def _request_in_order(self, key: tuple, entries: list) -> Dict[str, Any]:
+        """Send under the group's lock; the lock is dropped with its last user
+        so ``_locks`` does not grow with every group ever published.
+        """
+        holder = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        holder[1] += 1
+        try:
+            async with holder[0]:
+                return await self._request(key[0], entries)
+        finally:
+            holder[1] -= 1
+            if not holder[1]:
+                del self._locks[key]
+
+    async def _send(self, key: tuple, items: list) -> None:
+        queue_url = key[0]
+        entries = []
+        futures = {}
+        for index, (entry, future) in enumerate(items):
+            entries.append({**entry, "Id": str(index)})
+            futures[str(index)] = future
+
+        try:
+            if key[1] is None:
+                response = await self._request(queue_url, entries)
+            else:
+                # FIFO groups are sent one request at a time to keep their order.
+                response = await self._request_in_order(key, entries)
+        except Exception as error:
+            for future in futures.values():
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for success in response.get("Successful", []):
+            future = futures.pop(success["Id"], None)
+            if future is not None and not future.done():
+                future.set_result(success["MessageId"])
+
+        for failure in response.get("Failed", []):
+            future = futures.pop(failure["Id"], None)
+            if future is not None and not future.done():
+                future.set_exception(PublishError(failure))
+
+    async def flush(self) -> None:
+        for key in list(self._buffers):
+            self._flush(key)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def close(self) -> None:
+        await self.flush()
+
+
+class _Batch:
+    """Settings shared by every record of one handler invocation."""
+
+    def __init__(
+        self,
+        func,
+        partial_failures: bool,
+        context=None,
+        time_margin_ms=None,
+        idempotency=None,
+        idempotency_key=None,
+    ):
+        self.func = func
+        self.cloud_provider = get_cloud_provider()
+        self.partial_failures = partial_failures
+        self.context = context
+        self.time_margin_ms = time_margin_ms
+        self.timed_out = False
+        self.idempotency = idempotency
+        self.idempotency_key = idempotency_key or _message_id
+
+    def key(self, record) -> Optional[str]:
+        if self.idempotency is None:
+            return None
+        return self.idempotency_key(record)
+
+    def out_of_time(self) -> bool:
+        """True once the Lambda has less than ``time_margin_ms`` left; records
+        not started by then are reported as failures instead of risking a
+        timeout that would redeliver the whole batch.
+        """
+        if self.timed_out:
+            return True
+        if not self.time_margin_ms or not hasattr(self.context, "get_remaining_time_in_millis"):
+            return False
+
+        remaining = self.context.get_remaining_time_in_millis()
+        if remaining < self.time_margin_ms:
+            logger.warning(
+                "Stopping batch with %dms left (margin %dms)", remaining, self.time_margin_ms
+            )
+            self.timed_out = True
+        return self.timed_out
+
+
+def _message_id(record) -> str:
+    return record.data.get("messageId")
+
+
+def _group_id(data) -> Optional[str]:
+    return (data.get("attributes") or {}).get("MessageGroupId")
+
+
+def _handle_error(error, data, batch):
+    """Report a handler error; must be called from its ``except`` block.
+    Returns the batch item failure, or re-raises errors that cannot be
+    reported as one.
+    """
+    elastic.set_transaction_result("failure", override=False)
+    elastic.capture_exception(error)
+
+    if isinstance(error, FilteredEvent):
+        logger.warning(
+            "Filtered event while processing record %s on %s: %s",
+            data.get("messageId"),
+            batch.cloud_provider,
+            error,
+            exc_info=True,
+        )
+    else:
+        logger.error(
+            "Error processing record %s on %s: %s",
+            data,
+            batch.cloud_provider,
+            error,
+            exc_info=True,
+        )
+
+    if batch.cloud_provider == "aws":
+        if batch.partial_failures or isinstance(error, FilteredEvent):
+            return {"itemIdentifier": data.get("messageId")}
+    raise
+
+
+def _handle_result(result, batch):
+    if batch.cloud_provider == "aws":
+        if isinstance(result, dict) and "messageId" in result:
+            return {"itemIdentifier": result["messageId"]}
+
+    return None
+
+
+def _process_record(batch, data):
+    record = Record(data)
+    key = batch.key(record)
+
+    if key is not None and batch.idempotency.seen(key):
+        logger.info("Skipping duplicate record %s", key)
+        return None
+
+    try:
+        result = batch.func(record)
+    except Exception as error:
+        return _handle_error(error, data, batch)
+
+    failure = _handle_result(result, batch)
+    if failure is None and key is not None:
+        batch.idempotency.mark(key)
+    return failure
+
+
+def _record_groups(records):
+    """Split records into independent groups: one per FIFO ``MessageGroupId``,
+    keeping the records of a group in order, and one per standard record.
+    """
+    groups = []
+    by_group_id = {}
+
+    for data in records:
+        group_id = _group_id(data)
+        if group_id is None:
+            groups.append([data])
+        elif group_id in by_group_id:
+            by_group_id[group_id].append(data)
+        else:
+            by_group_id[group_id] = [data]
+            groups.append(by_group_id[group_id])
+
+    return groups
+
+
+class _GroupTracker:
+    """In partial failure mode, once a record of a FIFO group fails the rest of
+    that group is reported as failed without running, so SQS redelivers the
+    group in order.
+    """
+
+    def __init__(self, batch):
+        self.batch = batch
+        self.failed_groups = set()
+
+    def skip(self, data) -> bool:
+        return _group_id(data) in self.failed_groups
+
+    def failed(self, data) -> None:
+        group_id = _group_id(data)
+        if self.batch.partial_failures and group_id is not None:
+            self.failed_groups.add(group_id)
+
+
+def _process_group(batch, group):
+    failures = []
+    tracker = _GroupTracker(batch)
+
+    for data in group:
+        if tracker.skip(data) or batch.out_of_time():
+            failures.append({"itemIdentifier": data.get("messageId")})
+            continue
+
+        failure = _process_record(batch, data)
+        if failure is not None:
+            failures.append(failure)
+            tracker.failed(data)
+
+    return failures
+
+
+def _process_concurrently(batch, records, max_workers):
+    groups = _record_groups(records)
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(groups))) as executor:
+        futures = [
+            executor.submit(contextvars.copy_context().run, _process_group, batch, group)
+            for group in groups
+        ]
+
+    failures = []
+    for future in futures:
+        error = future.exception()
+        if error is not None:
+            raise error
+        failures.extend(future.result())
+
+    return failures
+
+
+def _time_margin_ms(time_margin_ms: Optional[int]) -> int:
+    if time_margin_ms is None:
+        return int(os.getenv("SQS_HANDLER_TIME_MARGIN_MS", "0"))
+    return time_margin_ms
+
+
+def _partial_failures(partial_failures: Optional[bool]) -> bool:
+    if partial_failures is None:
+        value = os.getenv("SQS_HANDLER_PARTIAL_FAILURES", "false")
+        return value.lower() in ("1", "true", "yes")
+    return partial_failures
+
+
+def handler(
+    func=None,
+    *,
+    max_workers: Optional[int] = None,
+    partial_failures: Optional[bool] = None,
+    time_margin_ms: Optional[int] = None,
+    idempotency=None,
+    idempotency_key: Optional[Callable[["Record"], str]] = None,
+):
     """
     Decorator to handle batch processing of events.
     - Logs incoming data.
     - Processes each record in the event.
     - Handles exceptions and returns a list of failed items.
+
+    With ``max_workers > 1`` (default ``SQS_HANDLER_MAX_WORKERS``, else ``1``)
+    records run on a thread pool; records sharing a FIFO ``MessageGroupId``
+    still run in order. Use as ``@handler`` or ``@handler(max_workers=8)``.
+
+    By default only `FilteredEvent` is reported as a batch item failure and
+    any other error fails the whole batch. With ``partial_failures=True``
+    (default ``SQS_HANDLER_PARTIAL_FAILURES``) every error is reported per
+    record, so only the failed messages are redelivered.
+
+    With ``time_margin_ms`` (default ``SQS_HANDLER_TIME_MARGIN_MS``, else off)
+    no record is started once the Lambda context reports less time left; the
+    remaining records are returned as batch item failures.
+
+    With an ``idempotency`` store (see `serpens.idempotency`) records whose
+    key (``idempotency_key(record)``, default the ``messageId``) was already
+    processed are skipped; keys are stored only after a successful run.
     """
+    if func is None:
+        return partial(
+            handler,
+            max_workers=max_workers,
+            partial_failures=partial_failures,
+            time_margin_ms=time_margin_ms,
+            idempotency=idempotency,
+            idempotency_key=idempotency_key,
+        )
+
+    workers = max_workers
+    if workers is None:
+        workers = int(os.getenv("SQS_HANDLER_MAX_WORKERS", "1"))
+    report_all = _partial_failures(partial_failures)
+    margin = _time_margin_ms(time_margin_ms)
 
     @wraps(func)
-    def wrapper(event: dict, _: dict):
+    def wrapper(event: dict, context):
         logger.debug("Received data: %s", event)
-        cloud_provider = get_cloud_provider()
-        events_failed = []
+        batch = _Batch(func, report_all, context, margin, idempotency, idempotency_key)
+        records = event["Records"]
 
-        for data in event["Records"]:
-            try:
-                result = func(Record(data))
-            except Exception as error:
-                elastic.set_transaction_result("failure", override=False)
-                elastic.capture_exception(error)
-
-                if isinstance(error, FilteredEvent):
-                    logger.warning(
-                        "Filtered event while processing record %s on %s: %s",
-                        data.get("messageId"),
-                        cloud_provider,
-                        error,
-                        exc_info=True,
-                    )
-
-                    if cloud_provider == "aws":
-                        events_failed.append({"itemIdentifier": data.get("messageId")})
-                    else:
-                        raise
-                else:
-                    logger.error(
-                        "Error processing record %s on %s: %s",
-                        data,
-                        cloud_provider,
-                        error,
-                        exc_info=True,
-                    )
-                    raise
+        if workers > 1 and len(records) > 1:
+            events_failed = _process_concurrently(batch, records, workers)
+        else:
+            events_failed = _process_group(batch, records)
+
+        if events_failed:
+            result = {"batchItemFailures": events_failed}
+            logger.debug(f"Result data: {result}")
+            return result
+
+    return wrapper
+
+
+async def _aprocess_record(batch, data):
+    record = Record(data)
+    key = batch.key(record)
+
+    if key is not None and await batch.idempotency.aseen(key):
+        logger.info("Skipping duplicate record %s", key)
+        return None
+
+    try:
+        result = await batch.func(record)
+    except Exception as error:
+        return _handle_error(error, data, batch)
+
+    failure = _handle_result(result, batch)
+    if failure is None and key is not None:
+        await batch.idempotency.amark(key)
+    return failure
+
+
+async def _aprocess_group(batch, group, semaphore):
+    failures = []
+    tracker = _GroupTracker(batch)
+
+    for data in group:
+        if tracker.skip(data):
+            failures.append({"itemIdentifier": data.get("messageId")})
+            continue
+
+        async with semaphore:
+            if batch.out_of_time():
+                failure = {"itemIdentifier": data.get("messageId")}
             else:
-                if cloud_provider == "aws":
-                    if isinstance(result, dict) and "messageId" in result:
-                        events_failed.append({"itemIdentifier": result["messageId"]})
+                failure = await _aprocess_record(batch, data)
+        if failure is not None:
+            failures.append(failure)
+            tracker.failed(data)
+
+    return failures
+
+
+async def _aprocess(batch, records, max_concurrency):
+    semaphore = asyncio.Semaphore(max_concurrency)
+    results = await asyncio.gather(
+        *(_aprocess_group(batch, group, semaphore) for group in _record_groups(records)),
+        return_exceptions=True,
+    )
+
+    failures = []
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+        failures.extend(result)
+
+    return failures
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def async_handler(
+    func=None,
+    *,
+    max_concurrency: Optional[int] = None,
+    partial_failures: Optional[bool] = None,
+    time_margin_ms: Optional[int] = None,
+    idempotency=None,
+    idempotency_key: Optional[Callable[["Record"], str]] = None,
+):
+    """`handler` for ``async def`` record handlers.
+
+    All records of a batch run on one event loop that stays alive across warm
+    invocations, so async clients (Redis, httpx) created on it are reused. At
+    most ``max_concurrency`` records (default ``SQS_HANDLER_MAX_CONCURRENCY``,
+    else ``10``) are in flight; FIFO ``MessageGroupId`` groups run in order.
+    ``partial_failures``, ``time_margin_ms`` and ``idempotency`` behave as in
+    `handler`. The returned Lambda entry point is synchronous.
+    """
+    if func is None:
+        return partial(
+            async_handler,
+            max_concurrency=max_concurrency,
+            partial_failures=partial_failures,
+            time_margin_ms=time_margin_ms,
+            idempotency=idempotency,
+            idempotency_key=idempotency_key,
+        )
+
+    concurrency = max_concurrency
+    if concurrency is None:
+        concurrency = int(os.getenv("SQS_HANDLER_MAX_CONCURRENCY", "10"))
+    report_all = _partial_failures(partial_failures)
+    margin = _time_margin_ms(time_margin_ms)
+
+    @wraps(func)
+    def wrapper(event: dict, context):
+        logger.debug("Received data: %s", event)
+        batch = _Batch(func, report_all, context, margin, idempotency, idempotency_key)
+
+        events_failed = _event_loop().run_until_complete(
+            _aprocess(batch, event["Records"], concurrency)
+        )
 
         if events_failed:
             result = {"batchItemFailures": events_failed}
@@ -161,28 +874,308 @@ def handler(func):
     return wrapper
 
 
+_UNSET = object()
+
+
 class Record:
+    """SQS record from a Lambda event. ``body``, ``sent_datetime`` and
+    ``queue_name`` are decoded on first access and cached, so handlers that
+    only look at ``message_attributes`` skip the parsing cost.
+    """
+
+    __slots__ = ("data", "message_attributes", "_queue_name", "_sent_datetime", "_body")
+
     def __init__(self, data: Dict[Any, Any]):
         self.data = data
-        self.queue_name = self._queue_name()
         self.message_attributes = data.get("messageAttributes")
-        self.sent_datetime = self._sent_datetime()
-        self.body = self._body()
+        self._queue_name = _UNSET
+        self._sent_datetime = _UNSET
+        self._body = _UNSET
+
+    @property
+    def queue_name(self) -> str:
+        if self._queue_name is _UNSET:
+            self._queue_name = self._parse_queue_name()
+        return self._queue_name
+
+    @property
+    def sent_datetime(self) -> datetime:
+        if self._sent_datetime is _UNSET:
+            self._sent_datetime = self._parse_sent_datetime()
+        return self._sent_datetime
+
+    @property
+    def body(self) -> Union[dict, str]:
+        if self._body is _UNSET:
+            self._body = self._decode_body()
+        return self._body
 
-    def _queue_name(self) -> str:
+    def _attribute(self, name: str) -> Optional[str]:
+        attribute = (self.message_attributes or {}).get(name) or {}
+        return attribute.get("stringValue")
+
+    def _parse_queue_name(self) -> str:
         arn_raw = self.data.get("eventSourceARN", "")
         return arn_raw.split(":")[-1]
 
-    def _sent_datetime(self) -> datetime:
+    def _parse_sent_datetime(self) -> datetime:
         return datetime.fromtimestamp(
             float(self.data["attributes"]["SentTimestamp"]) / 1000.0,
         )
 
-    def _body(self) -> Union[dict, str]:
+    def _decode_body(self) -> Union[dict, str]:
         body_raw = self.data.get("body")
 
+        if self._attribute(PAYLOAD_ATTRIBUTE) == "s3":
+            body_raw = _load_payload(body_raw)
+
+        encoding = self._attribute(codec.ENCODING_ATTRIBUTE)
+        if encoding:
+            body_raw = codec.decompress(base64.b64decode(body_raw), encoding).decode("utf-8")
+
         try:
             return json.loads(body_raw)
 
         except JSONDecodeError:
             return body_raw
+
+
+def _queue_arn(queue_url: str) -> str:
+    parsed = urlparse(queue_url)
+    host_parts = parsed.netloc.split(".")
+    region = host_parts[1] if len(host_parts) > 2 and host_parts[0] == "sqs" else ""
+    path_parts = parsed.path.strip("/").split("/")
+    account = path_parts[0] if len(path_parts) > 1 else ""
+    return f"arn:aws:sqs:{region}:{account}:{path_parts[-1]}"
+
+
+def _lambda_record(message: Dict[str, Any], queue_arn: str) -> Dict[str, Any]:
+    """Shape a ``receive_message`` message like a Lambda event record so the
+    same `Record`-based handlers serve both deployment models.
+    """
+    message_attributes = {
+        name: {key[0].lower() + key[1:]: value for key, value in attribute.items()}
+        for name, attribute in message.get("MessageAttributes", {}).items()
+    }
+    return {
+        "messageId": message["MessageId"],
+        "receiptHandle": message["ReceiptHandle"],
+        "body": message["Body"],
+        "attributes": message.get("Attributes", {}),
+        "messageAttributes": message_attributes,
+        "md5OfBody": message.get("MD5OfBody"),
+        "eventSource": "aws:sqs",
+        "eventSourceARN": queue_arn,
+    }
+
+
+class Consumer:
+    """Long-running SQS worker for container deployments.
+
+    ``pollers`` threads long-poll the queue (10 messages per call) into a
+    bounded buffer; ``max_workers`` threads run ``func`` on `Record` objects,
+    keeping FIFO ``MessageGroupId`` groups in order. Successful messages are
+    acknowledged through ``delete_message_batch``; failed or filtered ones are
+    left to reappear after their visibility timeout. Messages still buffered or
+    running past half of ``visibility_timeout`` get their visibility extended.
+
+        consumer = sqs.Consumer(QUEUE_URL, process, pollers=2, max_workers=16)
+        consumer.run()  # blocks; call consumer.stop() from a SIGTERM handler
+
+    ``idempotency`` / ``idempotency_key`` behave as in `handler`.
+    """
+
+    def __init__(
+        self,
+        queue_url: str,
+        func: Callable[[Record], Any],
+        *,
+        pollers: int = 1,
+        max_workers: int = 10,
+        buffer_size: Optional[int] = None,
+        wait_time_seconds: int = 20,
+        visibility_timeout: int = 30,
+        ack_interval: float = 1.0,
+        idempotency=None,
+        idempotency_key: Optional[Callable[[Record], str]] = None,
+    ):
+        self.queue_url = queue_url
+        self.func = func
+        self.pollers = pollers
+        self.max_workers = max_workers
+        self.wait_time_seconds = wait_time_seconds
+        self.visibility_timeout = visibility_timeout
+        self.ack_interval = ack_interval
+        self.idempotency = idempotency
+        self.idempotency_key = idempotency_key
+
+        self._client = get_client()
+        self._queue_arn = _queue_arn(queue_url)
+        self._buffer: queue.Queue = queue.Queue(maxsize=buffer_size or max_workers * 2)
+        self._acks: queue.Queue = queue.Queue()
+        self._inflight: Dict[str, float] = {}
+        self._inflight_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._workers_done = threading.Event()
+        self._poller_threads = []
+        self._worker_threads = []
+        self._service_threads = []
+
+    def start(self) -> None:
+        self._poller_threads = [
+            threading.Thread(target=self._poll, name=f"sqs-poller-{index}", daemon=True)
+            for index in range(self.pollers)
+        ]
+        self._worker_threads = [
+            threading.Thread(target=self._work, name=f"sqs-worker-{index}", daemon=True)
+            for index in range(self.max_workers)
+        ]
+        self._service_threads = [
+            threading.Thread(target=self._acknowledge, name="sqs-acker", daemon=True),
+            threading.Thread(target=self._heartbeat, name="sqs-heartbeat", daemon=True),
+        ]
+        for thread in self._poller_threads + self._worker_threads + self._service_threads:
+            thread.start()
+        logger.info("SQS consumer started on %s", self.queue_url)
+
+    def stop(self) -> None:
+        """Stop polling, finish buffered messages and flush pending deletes."""
+        self._stopping.set()
+        for thread in self._poller_threads + self._worker_threads:
+            thread.join()
+        self._workers_done.set()
+        for thread in self._service_threads:
+            thread.join()
+        logger.info("SQS consumer stopped on %s", self.queue_url)
+
+    def run(self) -> None:
+        self.start()
+        try:
+            while not self._stopping.wait(1):
+                pass
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if not self._workers_done.is_set():
+                self.stop()
+
+    def _poll(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                response = self._client.receive_message(
+                    QueueUrl=self.queue_url,
+                    MaxNumberOfMessages=MAX_BATCH_SIZE,
+                    WaitTimeSeconds=self.wait_time_seconds,
+                    VisibilityTimeout=self.visibility_timeout,
+                    AttributeNames=["All"],
+                    MessageAttributeNames=["All"],
+                )
+            except Exception as error:
+                logger.error("Error receiving from %s: %s", self.queue_url, error, exc_info=True)
+                self._stopping.wait(1)
+                continue
+
+            records = [
+                _lambda_record(message, self._queue_arn) for message in response.get("Messages", [])
+            ]
+            now = time.monotonic()
+            with self._inflight_lock:
+                for data in records:
+                    self._inflight[data["receiptHandle"]] = now
+
+            for group in _record_groups(records):
+                self._buffer.put(group)
+
+    def _work(self) -> None:
+        while True:
+            try:
+                group = self._buffer.get(timeout=0.1)
+            except queue.Empty:
+                if self._stopping.is_set() and all(
+                    not thread.is_alive() for thread in self._poller_threads
+                ):
+                    return
+                continue
+
+            batch = _Batch(
+                self.func,
+                partial_failures=True,
+                idempotency=self.idempotency,
+                idempotency_key=self.idempotency_key,
+            )
+            try:
+                failed = {failure["itemIdentifier"] for failure in _process_group(batch, group)}
+            except Exception as error:
+                logger.error("Error processing group on %s: %s", self.queue_url, error)
+                failed = {data["messageId"] for data in group}
+
+            with self._inflight_lock:
+                for data in group:
+                    self._inflight.pop(data["receiptHandle"], None)
+
+            for data in group:
+                if data["messageId"] not in failed:
+                    self._acks.put(data["receiptHandle"])
+
+    def _acknowledge(self) -> None:
+        pending = []
+        deadline = time.monotonic() + self.ack_interval
+
+        while True:
+            done = self._workers_done.is_set()
+            try:
+                pending.append(self._acks.get(timeout=0.05))
+            except queue.Empty:
+                pass
+
+            if len(pending) == MAX_BATCH_SIZE or (
+                pending and (time.monotonic() >= deadline or done)
+            ):
+                self._delete(pending)
+                pending = []
+                deadline = time.monotonic() + self.ack_interval
+
+            if done and not pending and self._acks.empty():
+                return
+
+    def _delete(self, receipt_handles) -> None:
+        entries = [
+            {"Id": str(index), "ReceiptHandle": handle}
+            for index, handle in enumerate(receipt_handles)
+        ]
+        try:
+            response = self._client.delete_message_batch(QueueUrl=self.queue_url, Entries=entries)
+        except Exception as error:
+            logger.error("Error deleting from %s: %s", self.queue_url, error, exc_info=True)
+            return
+
+        for failure in response.get("Failed", []):
+            logger.warning("Unable to delete message from %s: %s", self.queue_url, failure)
+
+    def _heartbeat(self) -> None:
+        interval = max(self.visibility_timeout / 3, 0.1)
+        while not self._workers_done.wait(interval):
+            self._extend_visibility()
+
+    def _extend_visibility(self) -> None:
+        threshold = time.monotonic() - self.visibility_timeout / 2
+        with self._inflight_lock:
+            stale = [handle for handle, since in self._inflight.items() if since <= threshold]
+            for handle in stale:
+                self._inflight[handle] = time.monotonic()
+
+        for index in range(0, len(stale), MAX_BATCH_SIZE):
+            entries = [
+                {
+                    "Id": str(position),
+                    "ReceiptHandle": handle,
+                    "VisibilityTimeout": self.visibility_timeout,
+                }
+                for position, handle in enumerate(stale[index : index + MAX_BATCH_SIZE])  # noqa
+            ]
+            try:
+                self._client.change_message_visibility_batch(
+                    QueueUrl=self.queue_url, Entries=entries
+                )
+            except Exception as error:
+                logger.warning("Unable to extend visibility on %s: %s", self.queue_url, error)
@@ -66,6 +66,81 @@ class TestSCache(unittest.TestCase):
         self.assertEqual(strike3, 2)
 
 
+class CachedBoundsTests(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.patch_time = patch("cache.time")
+        self.mock_time = self.patch_time.start()
+        self.mock_time.monotonic.return_value = 1000.0
+
+    def tearDown(self):
+        self.patch_time.stop()
+        cache.clear_cache("bounded")
+
+    def _lookup(self, maxsize=None, ttl=60):
+        @cache.cached("bounded", ttl, maxsize=maxsize)
+        def lookup(customer_id):
+            self.calls.append(customer_id)
+            return customer_id * 2
+
+        return lookup
+
+    def test_maxsize_evicts_least_recently_used(self):
+        lookup = self._lookup(maxsize=2)
+
+        lookup(1)
+        lookup(2)
+        lookup(1)
+        lookup(3)
+        lookup(1)
+        lookup(2)
+
+        self.assertEqual(self.calls, [1, 2, 3, 2])
+        self.assertEqual(list(cache.cache["bounded"]), [(1,), (2,)])
+        self.assertEqual(cache.cache_info("bounded"), cache.CacheInfo(2, 4, 2, 0, 2))
+
+    def test_expired_entry_is_dropped_on_read(self):
+        lookup = self._lookup(ttl=10)
+        lookup(1)
+
+        self.mock_time.monotonic.return_value = 1010.0
+        lookup(1)
+
+        self.assertEqual(self.calls, [1, 1])
+        self.assertEqual(cache.cache_info("bounded").expirations, 1)
+
+    def test_store_sweeps_expired_entries_every_purge_interval(self):
+        lookup = self._lookup(ttl=10)
+        lookup(1)
+        lookup(2)
+
+        self.mock_time.monotonic.return_value = 1000.0 + cache.CACHE_PURGE_INTERVAL
+        lookup(3)
+
+        self.assertEqual(list(cache.cache["bounded"]), [(3,)])
+        self.assertEqual(cache.cache_info("bounded").expirations, 2)
+
+    def test_purge_expired(self):
+        self._lookup(ttl=10)(1)
+        self._lookup(ttl=100)(2)
+
+        self.mock_time.monotonic.return_value = 1050.0
+
+        self.assertEqual(cache.purge_expired(), 1)
+        self.assertEqual(cache.cache_info("bounded").size, 1)
+
+    def test_clear_cache_resets_stats(self):
+        self._lookup()(1)
+
+        cache.clear_cache("bounded")
+
+        self.assertEqual(cache.cache_info("bounded"), cache.CacheInfo(0, 0, 0, 0, 0))
+
+    def test_invalid_maxsize(self):
+        with self.assertRaises(ValueError):
+            cache.cached("bounded", 60, maxsize=0)
+
+
 class AsyncInmemCacheTests(unittest.IsolatedAsyncioTestCase):
     def setUp(self):
         cache.clear_acache()
@@ -18,3 +18,13 @@ class TestCloudStorage(unittest.TestCase):
         self.assertIsNotNone(response)
         self.assertEqual(response.read(), b"abcdefghij")
         m_client.assert_called_once()
+
+    @patch("serpens.cloud_storage.storage")
+    def test_upload_object_succeeded(self, m_storage):
+        m_blob = m_storage.Client.return_value.bucket.return_value.blob.return_value
+
+        response = cloud_storage.upload_object(b"abc", "foo", "bar", "text/plain")
+
+        self.assertTrue(response)
+        m_storage.Client.return_value.bucket.assert_called_once_with("foo")
+        m_blob.upload_from_string.assert_called_once_with(b"abc", content_type="text/plain")
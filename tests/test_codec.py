@@ -0,0 +1,27 @@
+import unittest
+
+from serpens import codec
+
+
+class TestCodec(unittest.TestCase):
+    def test_roundtrip(self):
+        data = b'{"foo": "bar"}' * 100
+
+        for name in ("gzip", "zlib"):
+            with self.subTest(codec=name):
+                compressed = codec.compress(data, name)
+                self.assertLess(len(compressed), len(data))
+                self.assertEqual(codec.decompress(compressed, name), data)
+
+    @unittest.skipIf(codec.zstandard is None, "zstandard is not installed")
+    def test_roundtrip_zstd(self):
+        data = b'{"foo": "bar"}' * 100
+
+        self.assertEqual(codec.decompress(codec.compress(data, "zstd"), "zstd"), data)
+
+    def test_unsupported_codec(self):
+        with self.assertRaisesRegex(ValueError, "Unsupported compression codec 'lzma'"):
+            codec.compress(b"data", "lzma")
+
+        with self.assertRaisesRegex(ValueError, "Unsupported compression codec 'lzma'"):
+            codec.decompress(b"data", "lzma")
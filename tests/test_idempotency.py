@@ -0,0 +1,104 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from serpens.idempotency import IdempotencyStore, RedisIdempotencyStore
+
+
+class TestIdempotencyStore(unittest.TestCase):
+    def test_mark_and_seen(self):
+        store = IdempotencyStore(ttl=60)
+
+        self.assertFalse(store.seen("a"))
+        store.mark("a")
+        self.assertTrue(store.seen("a"))
+
+    @patch("serpens.idempotency.time.monotonic")
+    def test_expired_keys_are_not_seen(self, m_monotonic):
+        m_monotonic.return_value = 100.0
+        store = IdempotencyStore(ttl=10)
+        store.mark("a")
+
+        m_monotonic.return_value = 111.0
+
+        self.assertFalse(store.seen("a"))
+        self.assertNotIn("a", store._local)
+
+    def test_lru_eviction(self):
+        store = IdempotencyStore(ttl=60, maxsize=2)
+        store.mark("a")
+        store.mark("b")
+        store.seen("a")
+        store.mark("c")
+
+        self.assertTrue(store.seen("a"))
+        self.assertFalse(store.seen("b"))
+        self.assertTrue(store.seen("c"))
+
+
+class TestRedisIdempotencyStore(unittest.TestCase):
+    def setUp(self):
+        self.store = RedisIdempotencyStore(ttl=60, url="redis://localhost")
+        self.client = MagicMock()
+        self.store._client = self.client
+
+    def test_seen_checks_redis_and_caches_locally(self):
+        self.client.get.return_value = b"1"
+
+        self.assertTrue(self.store.seen("msg-1"))
+        self.assertTrue(self.store.seen("msg-1"))
+
+        self.client.get.assert_called_once_with("serpens:idempotency:msg-1")
+
+    def test_mark_sets_key_with_ttl(self):
+        self.store.mark("msg-1")
+
+        self.client.set.assert_called_once_with("serpens:idempotency:msg-1", "1", ex=60)
+
+    def test_fails_open(self):
+        self.client.get.side_effect = RedisConnectionError("down")
+        self.client.set.side_effect = RedisConnectionError("down")
+
+        self.assertFalse(self.store.seen("msg-1"))
+        self.store.mark("msg-1")
+        self.assertTrue(self.store.seen("msg-1"))
+
+
+class TestRedisIdempotencyStoreAsync(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.patch_redis = patch("serpens.idempotency.AsyncRedis")
+        self.mock_redis = self.patch_redis.start()
+        self.client = self.mock_redis.from_url.return_value
+        self.client.get = AsyncMock(return_value=None)
+        self.client.set = AsyncMock()
+
+    def tearDown(self):
+        self.patch_redis.stop()
+
+    async def test_async_paths_use_own_client(self):
+        store = RedisIdempotencyStore(ttl=60, url="redis://localhost")
+
+        self.assertFalse(await store.aseen("msg-1"))
+        await store.amark("msg-1")
+        self.assertTrue(await store.aseen("msg-1"))
+
+        self.mock_redis.from_url.assert_called_once_with("redis://localhost")
+        self.client.get.assert_awaited_once_with("serpens:idempotency:msg-1")
+        self.client.set.assert_awaited_once_with("serpens:idempotency:msg-1", "1", ex=60)
+
+    async def test_async_paths_fail_open(self):
+        self.client.get.side_effect = RedisConnectionError("down")
+        self.client.set.side_effect = RedisConnectionError("down")
+        store = RedisIdempotencyStore(ttl=60, url="redis://localhost")
+
+        with self.assertLogs("serpens.idempotency", level="WARNING"):
+            self.assertFalse(await store.aseen("msg-1"))
+            await store.amark("msg-1")
+        self.assertTrue(await store.aseen("msg-1"))
+
+    async def test_async_path_does_not_need_cache_redis_init(self):
+        with patch("serpens.idempotency.cache._redis_client", None):
+            store = RedisIdempotencyStore(ttl=60, url="redis://localhost")
+
+            self.assertFalse(await store.aseen("msg-1"))
@@ -1,10 +1,15 @@
+import asyncio
+import concurrent.futures
 import json
 import os
 import unittest
 from enum import Enum
 from unittest.mock import patch
 
-from serpens.messages import MessageClient
+from botocore.exceptions import ClientError
+
+from serpens import metrics, pubsub, sqs
+from serpens.messages import MessageClient, Outbox, OutboxError, buffered
 
 
 class TestMessages(unittest.TestCase):
@@ -12,10 +17,12 @@ class TestMessages(unittest.TestCase):
         self.patch_boto3 = patch("serpens.sqs.boto3")
         self.mock_boto3 = self.patch_boto3.start()
         self.sqs_client = self.mock_boto3.client.return_value
+        sqs.reset_clients()
 
         self.patch_pubsub_v1 = patch("serpens.pubsub.pubsub_v1")
         self.mock_pubsub_v1 = self.patch_pubsub_v1.start()
         self.pubsub_client = self.mock_pubsub_v1.PublisherClient.return_value
+        pubsub.reset_clients()
 
         self.destination = "sqs.us-east-1.amazonaws.com/1234567890/default_queue.fifo"
         self.body = {"message": "my message"}
@@ -62,7 +69,9 @@ class TestMessages(unittest.TestCase):
 
     def tearDown(self):
         self.patch_boto3.stop()
+        sqs.reset_clients()
         self.patch_pubsub_v1.stop()
+        pubsub.reset_clients()
 
     @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
     def test_publish_message_sqs(self):
@@ -108,6 +117,277 @@ class TestMessages(unittest.TestCase):
 
         self.assertIsInstance(response, dict)
 
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_apublish_message_sqs(self):
+        self.sqs_client.send_message.return_value = {"MessageId": "abc"}
+
+        response = asyncio.run(
+            MessageClient().apublish(self.destination, self.body, self.order_key, self.attributes)
+        )
+
+        self.assertEqual(response, {"MessageId": "abc"})
+        self.sqs_client.send_message.assert_called_once()
+        self.assertEqual(
+            self.sqs_client.send_message.call_args.kwargs["MessageGroupId"], self.order_key
+        )
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_apublish_message_batch_sqs(self):
+        asyncio.run(MessageClient().apublish_batch(self.destination, self.messages))
+
+        call_entries = self.sqs_client.send_message_batch.call_args.kwargs["Entries"]
+        for entry in call_entries:
+            del entry["Id"]
+        self.assertListEqual(call_entries, self.expected_entries)
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "pubsub"})
+    def test_apublish_message_pubsub(self):
+        future = concurrent.futures.Future()
+        future.set_result("10580991169012026")
+        self.pubsub_client.publish.return_value = future
+
+        response = asyncio.run(
+            MessageClient().apublish(self.destination, self.body, self.order_key, self.attributes)
+        )
+
+        self.assertEqual(response, {"MessageId": "10580991169012026"})
+        self.pubsub_client.publish.assert_called_once_with(
+            self.destination,
+            data=json.dumps(self.body).encode(),
+            ordering_key=self.order_key,
+            app_name="platform-default",
+        )
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "pubsub"})
+    def test_apublish_message_batch_pubsub(self):
+        futures = []
+        for message_id in ("1", "2"):
+            future = concurrent.futures.Future()
+            future.set_result(message_id)
+            futures.append(future)
+        self.pubsub_client.publish.side_effect = futures
+
+        response = asyncio.run(
+            MessageClient().apublish_batch("projects/p/topics/t", self.messages, "key")
+        )
+
+        self.assertEqual(response, ["1", "2"])
+        self.mock_pubsub_v1.PublisherClient.assert_called_once()
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_outbox_batches_publishes_per_destination(self):
+        client = MessageClient()
+        other = "sqs.us-east-1.amazonaws.com/1234567890/other_queue"
+
+        with Outbox(max_messages=10):
+            for index in range(12):
+                self.assertIsNone(client.publish(self.destination, f"m{index}", self.order_key))
+            client.publish(other, self.body, attributes=self.attributes)
+            self.assertEqual(self.sqs_client.send_message_batch.call_count, 1)
+
+        self.sqs_client.send_message.assert_not_called()
+        calls = self.sqs_client.send_message_batch.call_args_list
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(len(calls[0].kwargs["Entries"]), 10)
+        self.assertEqual(
+            {entry["MessageGroupId"] for entry in calls[0].kwargs["Entries"]}, {self.order_key}
+        )
+        self.assertEqual([len(call.kwargs["Entries"]) for call in calls[1:]], [2, 1])
+        self.assertEqual(
+            calls[2].kwargs["Entries"][0]["MessageAttributes"],
+            {"app_name": {"StringValue": "platform-default", "DataType": "String"}},
+        )
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_outbox_flushes_when_block_raises(self):
+        with self.assertRaises(RuntimeError):
+            with Outbox():
+                MessageClient().publish(self.destination, self.body)
+                raise RuntimeError("boom")
+
+        self.sqs_client.send_message_batch.assert_called_once()
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_outbox_flush_attempts_every_destination(self):
+        self.sqs_client.send_message_batch.side_effect = [ConnectionError("down"), {}]
+        client = MessageClient()
+
+        with self.assertRaises(ConnectionError):
+            with Outbox():
+                client.publish("queue-a", "a")
+                client.publish("queue-b", "b")
+
+        queues = [c.kwargs["QueueUrl"] for c in self.sqs_client.send_message_batch.call_args_list]
+        self.assertEqual(queues, ["queue-a", "queue-b"])
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_outbox_flush_collects_several_errors(self):
+        self.sqs_client.send_message_batch.side_effect = ConnectionError("down")
+
+        with self.assertRaises(OutboxError) as ctx:
+            with Outbox():
+                MessageClient().publish("queue-a", "a")
+                MessageClient().publish("queue-b", "b")
+
+        self.assertEqual(len(ctx.exception.errors), 2)
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_outbox_raises_on_failed_entries(self):
+        self.sqs_client.send_message_batch.return_value = {
+            "Successful": [{"Id": "0", "MessageId": "m"}],
+            "Failed": [{"Id": "1", "SenderFault": True, "Code": "Invalid", "Message": "bad"}],
+        }
+
+        with self.assertRaises(OutboxError) as ctx:
+            with Outbox():
+                MessageClient().publish("queue", "a")
+                MessageClient().publish("queue", "b")
+
+        self.assertEqual(ctx.exception.failures[0]["Id"], "1")
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_outbox_flush_error_keeps_block_error_as_context(self):
+        self.sqs_client.send_message_batch.side_effect = ConnectionError("down")
+
+        with self.assertRaises(ConnectionError) as ctx:
+            with Outbox():
+                MessageClient().publish("queue", "a")
+                raise RuntimeError("boom")
+
+        self.assertIsInstance(ctx.exception.__context__, RuntimeError)
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_buffered_decorator_with_sqs_handler_threads(self):
+        records = [
+            {"messageId": str(index), "body": f"m{index}", "eventSourceARN": "arn:a:b:c:d:q"}
+            for index in range(4)
+        ]
+
+        @buffered
+        @sqs.handler(max_workers=4)
+        def handler(record):
+            MessageClient().publish(self.destination, record.body)
+
+        handler({"Records": records}, None)
+
+        self.sqs_client.send_message.assert_not_called()
+        entries = self.sqs_client.send_message_batch.call_args.kwargs["Entries"]
+        self.assertEqual(
+            sorted(entry["MessageBody"] for entry in entries), ["m0", "m1", "m2", "m3"]
+        )
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "pubsub"})
+    def test_buffered_async_flushes_with_apublish_batch(self):
+        futures = []
+        for message_id in ("1", "2"):
+            future = concurrent.futures.Future()
+            future.set_result(message_id)
+            futures.append(future)
+        self.pubsub_client.publish.side_effect = futures
+
+        @buffered
+        async def handler():
+            client = MessageClient()
+            await client.apublish("projects/p/topics/t", {"n": 1})
+            await client.apublish("projects/p/topics/t", {"n": 2})
+            self.pubsub_client.publish.assert_not_called()
+
+        asyncio.run(handler())
+
+        self.assertEqual(self.pubsub_client.publish.call_count, 2)
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_publish_records_metrics(self):
+        sink = metrics.InMemoryMetricsSink()
+
+        MessageClient(metrics_sink=sink).publish(self.destination, "hello")
+
+        tags = {"provider": "sqs", "destination": self.destination, "operation": "publish"}
+        self.assertEqual(sink.counter("messages.published", **tags), 1)
+        self.assertEqual(sink.counter("messages.payload_bytes", **tags), 5)
+        self.assertEqual(sink.histogram("messages.latency_ms", **tags).count, 1)
+        self.assertEqual(sink.counter("messages.failures"), 0)
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_publish_batch_records_fill_ratio_and_failed_entries(self):
+        self.sqs_client.send_message_batch.return_value = {
+            "Successful": [{"Id": "0"}],
+            "Failed": [{"Id": "1", "Code": "RequestThrottled"}],
+        }
+        sink = metrics.InMemoryMetricsSink()
+
+        MessageClient(metrics_sink=sink).publish_batch(self.destination, self.messages)
+
+        tags = {"provider": "sqs", "destination": self.destination, "operation": "publish_batch"}
+        self.assertEqual(sink.counter("messages.published", **tags), 1)
+        self.assertEqual(sink.counter("messages.failures", error="RequestThrottled"), 1)
+        ratio = sink.histogram("messages.batch_fill_ratio", **tags)
+        self.assertAlmostEqual(ratio.sum, 2 / sqs.MAX_BATCH_SIZE)
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_batch_fill_ratio_counts_requests_sent(self):
+        self.sqs_client.send_message_batch.return_value = {"Successful": [], "Failed": []}
+        sink = metrics.InMemoryMetricsSink()
+        large = [{"body": "x" * (100 * 1024)} for _ in range(10)]
+
+        MessageClient(metrics_sink=sink).publish_batch(self.destination, large)
+
+        self.assertEqual(self.sqs_client.send_message_batch.call_count, 5)
+        tags = {"provider": "sqs", "destination": self.destination, "operation": "publish_batch"}
+        self.assertAlmostEqual(sink.histogram("messages.batch_fill_ratio", **tags).sum, 0.2)
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_publish_records_throttling_error_code(self):
+        self.sqs_client.send_message.side_effect = ClientError(
+            {"Error": {"Code": "RequestThrottled", "Message": "slow down"}}, "SendMessage"
+        )
+        sink = metrics.InMemoryMetricsSink()
+        metrics.set_sink(sink)
+        self.addCleanup(metrics.set_sink, None)
+
+        with self.assertRaises(ClientError):
+            MessageClient().publish(self.destination, self.body)
+
+        self.assertEqual(
+            sink.counter(
+                "messages.failures", destination=self.destination, error="RequestThrottled"
+            ),
+            1,
+        )
+        self.assertEqual(sink.counter("messages.published"), 0)
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "pubsub"})
+    def test_apublish_batch_records_metrics(self):
+        futures = []
+        for message_id in ("1", "2"):
+            future = concurrent.futures.Future()
+            future.set_result(message_id)
+            futures.append(future)
+        self.pubsub_client.publish.side_effect = futures
+        sink = metrics.InMemoryMetricsSink()
+
+        asyncio.run(
+            MessageClient(metrics_sink=sink).apublish_batch("projects/p/topics/t", self.messages)
+        )
+
+        self.assertEqual(sink.counter("messages.published", provider="pubsub"), 2)
+        self.assertEqual(sink.counter("messages.payload_bytes", provider="pubsub"), 18)
+        self.assertFalse(
+            any(name == "messages.batch_fill_ratio" for name, _ in sink.histograms.keys())
+        )
+
+    @patch.dict(os.environ, {"MESSAGE_PROVIDER": "sqs"})
+    def test_outbox_publishes_are_recorded_once_per_batch(self):
+        sink = metrics.InMemoryMetricsSink()
+        client = MessageClient(metrics_sink=sink)
+
+        with Outbox():
+            client.publish(self.destination, "a")
+            client.publish(self.destination, "b")
+
+        self.assertEqual(sink.counter("messages.published", operation="publish"), 0)
+        self.assertEqual(sink.counter("messages.published", operation="publish_batch"), 2)
+
     def test_publish_message_provider_improperly_configured(self):
         with self.assertRaises(ValueError):
             MessageClient.instance().publish(
@@ -0,0 +1,83 @@
+import threading
+import unittest
+
+from serpens import metrics
+
+
+class TestHistogram(unittest.TestCase):
+    def test_observe_fills_buckets_and_summary(self):
+        histogram = metrics.Histogram(buckets=(1, 10))
+
+        for value in (0.5, 1, 5, 50):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.counts, [2, 1, 1])
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(histogram.min, 0.5)
+        self.assertEqual(histogram.max, 50)
+        self.assertAlmostEqual(histogram.mean, 56.5 / 4)
+
+    def test_mean_of_empty_histogram_is_none(self):
+        self.assertIsNone(metrics.Histogram().mean)
+
+
+class TestInMemoryMetricsSink(unittest.TestCase):
+    def test_counter_sums_matching_series(self):
+        sink = metrics.InMemoryMetricsSink()
+
+        sink.increment("published", tags={"destination": "a", "provider": "sqs"})
+        sink.increment("published", 2, tags={"destination": "b", "provider": "sqs"})
+
+        self.assertEqual(sink.counter("published"), 3)
+        self.assertEqual(sink.counter("published", destination="b"), 2)
+        self.assertEqual(sink.counter("published", destination="c"), 0)
+
+    def test_histogram_is_per_exact_tags(self):
+        sink = metrics.InMemoryMetricsSink()
+
+        sink.observe("latency", 3, {"destination": "a"})
+
+        self.assertEqual(sink.histogram("latency", destination="a").count, 1)
+        self.assertIsNone(sink.histogram("latency"))
+
+    def test_increment_is_thread_safe(self):
+        sink = metrics.InMemoryMetricsSink()
+
+        def work():
+            for _ in range(1000):
+                sink.increment("hits")
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sink.counter("hits"), 8000)
+
+    def test_reset(self):
+        sink = metrics.InMemoryMetricsSink()
+        sink.increment("hits")
+        sink.observe("latency", 1)
+
+        sink.reset()
+
+        self.assertEqual(sink.counters, {})
+        self.assertEqual(sink.histograms, {})
+
+
+class TestGlobalSink(unittest.TestCase):
+    def tearDown(self):
+        metrics.set_sink(None)
+
+    def test_set_and_get_sink(self):
+        self.assertIsNone(metrics.get_sink())
+        sink = metrics.MetricsSink()
+
+        metrics.set_sink(sink)
+
+        self.assertIs(metrics.get_sink(), sink)
+
+
+if __name__ == "__main__":
+    unittest.main()
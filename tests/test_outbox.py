@@ -0,0 +1,196 @@
+import json
+import unittest
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+from sqlalchemy import select
+
+from serpens import database
+from serpens.database import Base
+from serpens.database.outbox import (
+    AsyncOutboxRepository,
+    OutboxMixin,
+    OutboxRelay,
+    OutboxRepository,
+)
+
+
+class _OutboxEvent(OutboxMixin, Base):
+    __tablename__ = "outbox_event"
+
+
+class OutboxRepo(OutboxRepository[_OutboxEvent]):
+    model = _OutboxEvent
+
+
+class AsyncOutboxRepo(AsyncOutboxRepository[_OutboxEvent]):
+    model = _OutboxEvent
+
+
+def _pending():
+    with database.db_session() as sess:
+        return list(sess.scalars(select(_OutboxEvent).order_by(_OutboxEvent.id)).all())
+
+
+class TestOutbox(unittest.TestCase):
+    def setUp(self):
+        database.dispose()
+        self.engine = database.bind("sqlite:///:memory:")
+        Base.metadata.create_all(self.engine)
+        self.client = MagicMock()
+        self.client.publish_batch.return_value = []
+
+    def tearDown(self):
+        database.dispose()
+
+    def test_enqueue_commits_with_the_session(self):
+        with database.db_session() as sess:
+            OutboxRepo(sess).enqueue("queue", {"amount": Decimal("1.5")}, "k", {"app": "x"})
+
+        with self.assertRaises(RuntimeError):
+            with database.db_session() as sess:
+                OutboxRepo(sess).enqueue("queue", {"lost": True})
+                raise RuntimeError("rollback")
+
+        (event,) = _pending()
+        self.assertEqual(event.destination, "queue")
+        self.assertEqual(json.loads(event.body), {"amount": 1.5})
+        self.assertEqual(event.order_key, "k")
+        self.assertEqual(event.attributes, {"app": "x"})
+
+    def test_relay_publishes_in_groups_and_deletes(self):
+        with database.db_session() as sess:
+            repo = OutboxRepo(sess)
+            repo.enqueue_many("q1", [{"n": 1}, {"n": 2}], order_key="a")
+            repo.enqueue("q2", "text", attributes={"app": "x"})
+            repo.enqueue("q1", {"n": 3}, order_key="a")
+
+        relayed = OutboxRelay(_OutboxEvent, self.client).relay_once()
+
+        self.assertEqual(relayed, 4)
+        self.assertEqual(_pending(), [])
+        self.assertEqual(
+            [call.args for call in self.client.publish.call_args_list],
+            [("q1", {"n": 1}, "a", None), ("q1", {"n": 2}, "a", None), ("q1", {"n": 3}, "a", None)],
+        )
+        self.client.publish_batch.assert_called_once_with(
+            "q2", [{"body": "text", "attributes": {"app": "x"}}]
+        )
+
+    def test_relay_respects_batch_size(self):
+        with database.db_session() as sess:
+            OutboxRepo(sess).enqueue_many("q", range(5))
+
+        relay = OutboxRelay(_OutboxEvent, self.client, batch_size=2)
+
+        self.assertEqual(relay.relay_once(), 2)
+        self.assertEqual([json.loads(event.body) for event in _pending()], [2, 3, 4])
+
+    def test_relay_keeps_failed_events(self):
+        with database.db_session() as sess:
+            repo = OutboxRepo(sess)
+            repo.enqueue_many("sqs", ["a", "b", "c"])
+            repo.enqueue("pubsub", "d")
+
+        def publish_batch(destination, messages):
+            if destination == "pubsub":
+                raise ConnectionError("down")
+            return [{"Successful": [{"Id": "0"}, {"Id": "2"}], "Failed": [{"Id": "1"}]}]
+
+        self.client.publish_batch.side_effect = publish_batch
+
+        with self.assertLogs("serpens.database.outbox", level="WARNING"):
+            relayed = OutboxRelay(_OutboxEvent, self.client).relay_once()
+
+        self.assertEqual(relayed, 2)
+        pending = _pending()
+        self.assertEqual([json.loads(event.body) for event in pending], ["b", "d"])
+        self.assertEqual([event.attempts for event in pending], [1, 1])
+
+    def test_relay_stops_ordered_group_at_first_failure(self):
+        with database.db_session() as sess:
+            OutboxRepo(sess).enqueue_many("q.fifo", ["a", "b", "c"], "k", {"app": "x"})
+            OutboxRepo(sess).enqueue("q.fifo", "z", "other")
+
+        def publish(destination, body, order_key, attributes):
+            if body == "b":
+                raise ConnectionError("down")
+
+        self.client.publish.side_effect = publish
+
+        with self.assertLogs("serpens.database.outbox", level="ERROR"):
+            relayed = OutboxRelay(_OutboxEvent, self.client).relay_once()
+
+        self.assertEqual(relayed, 2)
+        self.assertEqual(
+            [(json.loads(event.body), event.attempts) for event in _pending()],
+            [("b", 1), ("c", 0)],
+        )
+        self.assertEqual(
+            [call.args[1] for call in self.client.publish.call_args_list], ["a", "b", "z"]
+        )
+        self.assertEqual(
+            self.client.publish.call_args_list[0].args, ("q.fifo", "a", "k", {"app": "x"})
+        )
+        self.client.publish_batch.assert_not_called()
+
+        self.client.publish.side_effect = None
+        self.assertEqual(OutboxRelay(_OutboxEvent, self.client).relay_once(), 2)
+        self.assertEqual(
+            [call.args[1] for call in self.client.publish.call_args_list[3:]], ["b", "c"]
+        )
+
+    def test_relay_parks_poison_rows(self):
+        with database.db_session() as sess:
+            OutboxRepo(sess).enqueue_many("q", ["poison", "poison"])
+            OutboxRepo(sess).enqueue("other", "fresh")
+
+        def publish_batch(destination, messages):
+            if destination == "q":
+                raise ValueError("SenderFault")
+            return []
+
+        self.client.publish_batch.side_effect = publish_batch
+        relay = OutboxRelay(_OutboxEvent, self.client, batch_size=2, max_attempts=2)
+
+        with self.assertLogs("serpens.database.outbox", level="WARNING") as logs:
+            self.assertEqual(relay.relay_once(), 0)
+            self.assertEqual(relay.relay_once(), 0)
+        self.assertEqual(relay.relay_once(), 1)
+
+        self.assertTrue(any("parked after 2 attempts" in line for line in logs.output))
+        self.assertEqual([event.attempts for event in _pending()], [2, 2])
+
+    def test_run_until_stopped(self):
+        with database.db_session() as sess:
+            OutboxRepo(sess).enqueue("q", "a")
+
+        relay = OutboxRelay(_OutboxEvent, self.client, poll_interval=0.01)
+        self.client.publish_batch.side_effect = lambda *args: relay.stop()
+
+        relay.run()
+
+        self.client.publish_batch.assert_called_once()
+        self.assertEqual(_pending(), [])
+
+
+class TestAsyncOutbox(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        database.dispose()
+        database._async_engine = None
+        database.AsyncSessionLocal = None
+        database.async_bind("sqlite+aiosqlite:///:memory:")
+        async with database._async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def asyncTearDown(self):
+        await database.async_dispose()
+
+    async def test_async_enqueue(self):
+        async with database.AsyncSessionLocal() as sess:
+            repo = AsyncOutboxRepo(sess)
+            await repo.enqueue("q", {"n": 1}, attributes={"app": "x"})
+            await repo.enqueue_many("q", [2, 3])
+            await sess.flush()
+
+            self.assertEqual(await repo.count(destination="q"), 3)
@@ -1,14 +1,38 @@
+import asyncio
+import base64
 import concurrent.futures
+import io
 import json
+import os
+import threading
+import time
 import unittest
+from datetime import datetime, timezone
 from unittest.mock import MagicMock, patch
 
 from google.api_core import exceptions
-from pubsub import AsyncPublisher, publish_message, publish_message_batch
+import pubsub as pubsub_module
+from pubsub import (
+    AsyncPublisher,
+    Record,
+    Subscriber,
+    decode_data,
+    publish_message,
+    publish_message_batch,
+    push_handler,
+)
+from serpens import api
+from serpens.sentry import FilteredEvent
 from serpens.schema import SchemaEncoder
 
 
 class pubsub(unittest.TestCase):
+    def setUp(self):
+        pubsub_module.reset_clients()
+
+    def tearDown(self):
+        pubsub_module.reset_clients()
+
     @patch("pubsub.pubsub_v1")
     def test_publish_message_succeeded(self, m_pubsub_v1):
         use_cases = (
@@ -167,6 +191,283 @@ class pubsub(unittest.TestCase):
             )
 
 
+class ClaimCheckTests(unittest.TestCase):
+    def setUp(self):
+        pubsub_module.reset_clients()
+
+    def tearDown(self):
+        pubsub_module.reset_clients()
+
+    @patch.dict(os.environ, {"PUBSUB_PAYLOAD_BUCKET": "payloads"})
+    @patch("serpens.cloud_storage.upload_object")
+    @patch("pubsub.pubsub_v1")
+    def test_publish_message_offloads_large_data(self, m_pubsub_v1, m_upload):
+        data = "x" * (pubsub_module.MAX_MESSAGE_BYTES + 1)
+        publisher = m_pubsub_v1.PublisherClient.return_value
+
+        publish_message("projects/p/topics/t", data)
+
+        args, _ = m_upload.call_args
+        self.assertEqual(args[:2], (data.encode("utf-8"), "payloads"))
+        publisher.publish.assert_called_once_with(
+            "projects/p/topics/t",
+            data=f"gs://payloads/{args[2]}".encode("utf-8"),
+            ordering_key="",
+            **{"serpens.payload": "gcs"},
+        )
+
+    @patch.dict(os.environ, {"PUBSUB_PAYLOAD_BUCKET": "payloads"})
+    @patch("serpens.cloud_storage.upload_object")
+    @patch("pubsub.pubsub_v1")
+    def test_publish_message_counts_attributes_and_margin(self, m_pubsub_v1, m_upload):
+        limit = pubsub_module.MAX_MESSAGE_BYTES - pubsub_module.MESSAGE_SIZE_MARGIN
+        data = "x" * (limit - 10)
+
+        publish_message("projects/p/topics/t", data)
+        m_upload.assert_not_called()
+
+        publish_message("projects/p/topics/t", data, attributes={"tenant": "0123456789"})
+        m_upload.assert_called_once()
+
+    @patch.dict(os.environ, {"PUBSUB_PAYLOAD_BUCKET": "payloads"})
+    @patch("serpens.cloud_storage.upload_object")
+    @patch("pubsub.pubsub_v1")
+    def test_publish_message_keeps_small_data_inline(self, m_pubsub_v1, m_upload):
+        publish_message("projects/p/topics/t", {"foo": "bar"})
+
+        m_upload.assert_not_called()
+
+    @patch("serpens.cloud_storage.get_object")
+    def test_decode_data_resolves_offloaded_payload(self, m_get_object):
+        m_get_object.return_value = io.BytesIO(b"original")
+
+        data = decode_data(b"gs://payloads/pubsub-payloads/abc", {"serpens.payload": "gcs"})
+
+        self.assertEqual(data, b"original")
+        m_get_object.assert_called_once_with("payloads", "pubsub-payloads/abc")
+
+    @patch("pubsub.pubsub_v1")
+    def test_publish_message_compressed_roundtrip(self, m_pubsub_v1):
+        publisher = m_pubsub_v1.PublisherClient.return_value
+
+        publish_message("projects/p/topics/t", {"foo": "bar"}, compression="gzip")
+
+        _, kwargs = publisher.publish.call_args
+        self.assertEqual(kwargs["serpens.encoding"], "gzip")
+        attributes = {"serpens.encoding": kwargs["serpens.encoding"]}
+        self.assertEqual(json.loads(decode_data(kwargs["data"], attributes)), {"foo": "bar"})
+
+    def test_decode_data_passthrough(self):
+        self.assertEqual(decode_data(b"inline", {"foo": "bar"}), b"inline")
+
+
+class ClientCacheTests(unittest.TestCase):
+    def setUp(self):
+        pubsub_module.reset_clients()
+
+    def tearDown(self):
+        pubsub_module.reset_clients()
+
+    @patch("pubsub.pubsub_v1")
+    def test_publishes_reuse_one_client(self, m_pubsub_v1):
+        publish_message("projects/p/topics/t", "a")
+        publish_message("projects/p/topics/t", "b")
+
+        m_pubsub_v1.PublisherClient.assert_called_once()
+
+    @patch("pubsub.pubsub_v1")
+    def test_clients_are_keyed_by_ordering(self, m_pubsub_v1):
+        m_pubsub_v1.PublisherClient.side_effect = lambda **kwargs: MagicMock()
+
+        unordered = pubsub_module.get_client()
+        ordered = pubsub_module.get_client(ordering=True)
+
+        self.assertIs(pubsub_module.get_client(), unordered)
+        self.assertIsNot(ordered, unordered)
+
+    @patch("pubsub.pubsub_v1")
+    def test_reset_clients_stops_clients(self, m_pubsub_v1):
+        client = pubsub_module.get_client()
+
+        pubsub_module.reset_clients()
+
+        client.stop.assert_called_once()
+        self.assertIsNot(pubsub_module.get_client(), None)
+        self.assertEqual(m_pubsub_v1.PublisherClient.call_count, 2)
+
+
+def _failed_future(error):
+    fut = concurrent.futures.Future()
+    fut.set_exception(error)
+    return fut
+
+
+class OrderingKeyTests(unittest.TestCase):
+    def setUp(self):
+        pubsub_module.reset_clients()
+
+    def tearDown(self):
+        pubsub_module.reset_clients()
+
+    @patch("pubsub.get_client")
+    def test_batch_uses_per_message_ordering_keys(self, m_get_client):
+        publisher = m_get_client.return_value
+        publisher.publish.side_effect = lambda *a, **kw: _resolved_future(kw["ordering_key"])
+        messages = [
+            {"body": "a", "ordering_key": "tenant-1"},
+            {"body": "b", "ordering_key": "tenant-2"},
+            {"body": "c"},
+        ]
+
+        result = publish_message_batch("projects/p/topics/t", messages, ordering_key="default")
+
+        self.assertEqual(result, ["tenant-1", "tenant-2", "default"])
+        m_get_client.assert_called_once_with(ordering=True)
+
+    @patch("pubsub.get_client")
+    def test_batch_without_keys_uses_unordered_client(self, m_get_client):
+        m_get_client.return_value.publish.return_value = _resolved_future("id")
+
+        publish_message_batch("projects/p/topics/t", [{"body": "a"}])
+
+        m_get_client.assert_called_once_with(ordering=False)
+
+    @patch("pubsub.get_client")
+    def test_batch_resumes_failed_keys_and_raises(self, m_get_client):
+        publisher = m_get_client.return_value
+        outcomes = iter(
+            [
+                _resolved_future("id-1"),
+                _failed_future(exceptions.ServiceUnavailable("down")),
+                _failed_future(RuntimeError("paused")),
+            ]
+        )
+        publisher.publish.side_effect = lambda *a, **kw: next(outcomes)
+        messages = [
+            {"body": "a", "ordering_key": "k1"},
+            {"body": "b", "ordering_key": "k2"},
+            {"body": "c", "ordering_key": "k2"},
+        ]
+
+        with self.assertRaises(exceptions.ServiceUnavailable):
+            publish_message_batch("projects/p/topics/t", messages)
+
+        publisher.resume_publish.assert_called_once_with("projects/p/topics/t", "k2")
+
+    @patch("pubsub.get_client")
+    def test_publish_message_resumes_ordering_key_on_failure(self, m_get_client):
+        publisher = m_get_client.return_value
+        publisher.publish.return_value = _failed_future(exceptions.ServiceUnavailable("down"))
+
+        with self.assertRaises(exceptions.ServiceUnavailable):
+            publish_message("projects/p/topics/t", "a", ordering_key="k")
+
+        publisher.resume_publish.assert_called_once_with("projects/p/topics/t", "k")
+
+
+class AsyncPublishFunctionTests(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        pubsub_module.reset_clients()
+
+    def tearDown(self):
+        pubsub_module.reset_clients()
+
+    @patch("pubsub.get_client")
+    async def test_apublish_message_enqueues_off_the_loop(self, m_get_client):
+        threads = []
+        m_get_client.return_value.publish.side_effect = lambda *a, **kw: (
+            threads.append(threading.get_ident()) or _resolved_future("id")
+        )
+
+        result = await pubsub_module.apublish_message("projects/p/topics/t", {"n": 1})
+
+        self.assertEqual(result, "id")
+        self.assertEqual(len(threads), 1)
+        self.assertNotIn(threading.get_ident(), threads)
+
+    @patch("pubsub.get_client")
+    async def test_apublish_message_batch_resumes_failed_keys(self, m_get_client):
+        publisher = m_get_client.return_value
+        threads = []
+
+        def publish(*args, **kwargs):
+            threads.append(threading.get_ident())
+            return _failed_future(exceptions.ServiceUnavailable("down"))
+
+        publisher.publish.side_effect = publish
+
+        with self.assertRaises(exceptions.ServiceUnavailable):
+            await pubsub_module.apublish_message_batch(
+                "projects/p/topics/t", [{"body": "a", "ordering_key": "k"}]
+            )
+
+        publisher.resume_publish.assert_called_once_with("projects/p/topics/t", "k")
+        self.assertNotIn(threading.get_ident(), threads)
+
+
+class PublisherSettingsTests(unittest.TestCase):
+    def setUp(self):
+        pubsub_module.reset_clients()
+
+    def tearDown(self):
+        pubsub_module.reset_clients()
+
+    def test_batch_settings_defaults(self):
+        settings = pubsub_module.build_batch_settings()
+
+        self.assertEqual(settings.max_messages, 1000)
+        self.assertEqual(settings.max_bytes, 9000000)
+        self.assertEqual(settings.max_latency, 0.01)
+
+    @patch.dict(
+        "os.environ",
+        {"PUBSUB_BATCH_MAX_MESSAGES": "50", "PUBSUB_BATCH_MAX_LATENCY": "0.05"},
+    )
+    def test_batch_settings_from_env_and_arguments(self):
+        settings = pubsub_module.build_batch_settings(max_bytes=1024)
+
+        self.assertEqual(settings.max_messages, 50)
+        self.assertEqual(settings.max_bytes, 1024)
+        self.assertEqual(settings.max_latency, 0.05)
+
+    def test_flow_control_keeps_sdk_behavior_by_default(self):
+        self.assertEqual(
+            pubsub_module.build_flow_control().limit_exceeded_behavior,
+            pubsub_module.pubsub_v1.types.LimitExceededBehavior.IGNORE,
+        )
+
+    @patch.dict("os.environ", {"PUBSUB_FLOW_CONTROL_BEHAVIOR": "error"})
+    def test_flow_control_from_env(self):
+        flow_control = pubsub_module.build_flow_control(message_limit=5)
+
+        self.assertEqual(flow_control.message_limit, 5)
+        self.assertEqual(flow_control.byte_limit, 100000000)
+        self.assertEqual(
+            flow_control.limit_exceeded_behavior,
+            pubsub_module.pubsub_v1.types.LimitExceededBehavior.ERROR,
+        )
+
+    def test_flow_control_rejects_unknown_behavior(self):
+        with self.assertRaises(ValueError):
+            pubsub_module.build_flow_control(limit_exceeded_behavior="drop")
+
+    @patch("pubsub.pubsub_v1.PublisherClient")
+    def test_client_uses_settings_and_is_keyed_by_them(self, m_client):
+        m_client.side_effect = lambda **kwargs: MagicMock()
+        small = pubsub_module.build_batch_settings(max_messages=10)
+
+        default = pubsub_module.get_client()
+        custom = pubsub_module.get_client(batch_settings=small)
+
+        self.assertIsNot(default, custom)
+        self.assertIs(pubsub_module.get_client(batch_settings=small), custom)
+        kwargs = m_client.call_args_list[1].kwargs
+        self.assertEqual(kwargs["batch_settings"], small)
+        self.assertEqual(
+            kwargs["publisher_options"].flow_control, pubsub_module.build_flow_control()
+        )
+
+
 def _resolved_future(value):
     fut = concurrent.futures.Future()
     fut.set_result(value)
@@ -229,3 +530,274 @@ class AsyncPublisherTests(unittest.IsolatedAsyncioTestCase):
 
         m_span.assert_called_once_with("projects/p/topics/t", span_type="messaging")
         span.label.assert_called_once_with(queue_name="projects/p/topics/t")
+
+    @patch("pubsub.pubsub_v1")
+    async def test_publish_many_enqueues_all_before_awaiting(self, m_pubsub_v1):
+        pending = []
+
+        def publish(topic, data, ordering_key, **attributes):
+            future = concurrent.futures.Future()
+            pending.append(future)
+            return future
+
+        m_pubsub_v1.PublisherClient.return_value = MagicMock(publish=MagicMock(side_effect=publish))
+        publisher = AsyncPublisher()
+        messages = [
+            {"body": {"n": 1}},
+            {"body": "two", "attributes": {"kind": "text"}},
+        ]
+
+        task = asyncio.ensure_future(publisher.publish_many("projects/p/topics/t:ep", messages))
+        await asyncio.sleep(0)
+        self.assertEqual(len(pending), 2)
+        for index, future in enumerate(reversed(pending)):
+            future.set_result(f"id-{1 - index}")
+        result = await task
+
+        self.assertEqual(result, ["id-0", "id-1"])
+        first, second = publisher._client.publish.call_args_list
+        self.assertEqual(json.loads(first.kwargs["data"]), {"n": 1})
+        self.assertEqual(first.kwargs["endpoint"], "ep")
+        self.assertEqual(second.kwargs["kind"], "text")
+        self.assertEqual(second.args[0], "projects/p/topics/t")
+        self.assertNotIn("endpoint", messages[1]["attributes"])
+
+    @patch("pubsub.capture_span")
+    @patch("pubsub.pubsub_v1")
+    async def test_publish_many_emits_one_span(self, m_pubsub_v1, m_span):
+        m_pubsub_v1.PublisherClient.return_value = MagicMock(
+            publish=MagicMock(side_effect=lambda *a, **kw: _resolved_future("id")),
+        )
+        span = MagicMock()
+        m_span.return_value.__enter__.return_value = span
+
+        publisher = AsyncPublisher(ordering_key="k")
+        await publisher.publish_many("projects/p/topics/t", [{"body": "a"}, {"body": "b"}])
+
+        m_span.assert_called_once_with("projects/p/topics/t", span_type="messaging")
+        span.label.assert_called_once_with(queue_name="projects/p/topics/t", batch_size=2)
+        for call in publisher._client.publish.call_args_list:
+            self.assertEqual(call.kwargs["ordering_key"], "k")
+
+
+def _message(data, attributes=None, message_id="m-1"):
+    return MagicMock(data=data, attributes=attributes or {}, message_id=message_id)
+
+
+class RecordTests(unittest.TestCase):
+    def test_body_is_parsed_lazily_and_cached(self):
+        message = _message(b'{"foo": "bar"}')
+
+        with patch("pubsub.decode_data", side_effect=decode_data) as m_decode:
+            record = Record(message)
+            m_decode.assert_not_called()
+
+            self.assertEqual(record.body, {"foo": "bar"})
+            self.assertEqual(record.body, {"foo": "bar"})
+            m_decode.assert_called_once()
+
+    def test_body_falls_back_to_text(self):
+        self.assertEqual(Record(_message(b"plain")).body, "plain")
+
+    def test_body_decompresses(self):
+        attributes = {}
+        data = pubsub_module._compress(b'{"n": 1}', attributes, "gzip")
+
+        self.assertEqual(Record(_message(data, attributes)).body, {"n": 1})
+
+
+class SubscriberTests(unittest.TestCase):
+    @patch("pubsub.pubsub_v1.SubscriberClient")
+    def test_start_subscribes_with_flow_control(self, m_client):
+        subscriber = Subscriber("projects/p/subscriptions/s", print, max_messages=50, max_workers=4)
+
+        subscriber.start()
+        subscriber.stop()
+
+        args, kwargs = m_client.return_value.subscribe.call_args
+        self.assertEqual(args, ("projects/p/subscriptions/s", subscriber._process))
+        self.assertEqual(kwargs["flow_control"].max_messages, 50)
+        self.assertEqual(kwargs["flow_control"].max_bytes, 104857600)
+        self.assertEqual(kwargs["scheduler"]._executor._max_workers, 4)
+        m_client.return_value.subscribe.return_value.cancel.assert_called_once()
+        m_client.return_value.close.assert_called_once()
+
+    def test_acks_on_success(self):
+        received = []
+        message = _message(b'{"id": 1}')
+
+        Subscriber("s", lambda record: received.append(record.body))._process(message)
+
+        self.assertEqual(received, [{"id": 1}])
+        message.ack.assert_called_once()
+        message.nack.assert_not_called()
+
+    def test_nacks_on_error(self):
+        message = _message(b"x")
+
+        def handler(record):
+            raise ValueError("boom")
+
+        with self.assertLogs("pubsub", level="ERROR"):
+            Subscriber("s", handler)._process(message)
+
+        message.nack.assert_called_once()
+        message.ack.assert_not_called()
+
+    def test_filtered_event_is_a_warning(self):
+        message = _message(b"x")
+
+        def handler(record):
+            raise FilteredEvent("ignore me")
+
+        with self.assertLogs("pubsub", level="WARNING") as logs:
+            Subscriber("s", handler)._process(message)
+
+        self.assertEqual(logs.records[0].levelname, "WARNING")
+        message.nack.assert_called_once()
+
+    @patch("pubsub.pubsub_v1.SubscriberClient")
+    def test_async_handler_runs_on_event_loop(self, m_client):
+        received = []
+
+        async def handler(record):
+            await asyncio.sleep(0)
+            if record.body == "bad":
+                raise ValueError("bad")
+            received.append(record.body)
+
+        subscriber = Subscriber("s", handler)
+        subscriber.start()
+        callback = m_client.return_value.subscribe.call_args.args[1]
+        good, bad = _message(b"good"), _message(b"bad")
+        with self.assertLogs("pubsub", level="ERROR"):
+            callback(good)
+            callback(bad)
+            subscriber.stop()
+
+        self.assertEqual(received, ["good"])
+        good.ack.assert_called_once()
+        bad.nack.assert_called_once()
+        self.assertFalse(subscriber._loop_thread.is_alive())
+
+    @patch("pubsub.pubsub_v1.SubscriberClient")
+    def test_stop_drains_async_handlers_before_cancelling_stream(self, m_client):
+        events = []
+        release = threading.Event()
+
+        async def handler(record):
+            await asyncio.get_running_loop().run_in_executor(None, release.wait)
+
+        subscriber = Subscriber("s", handler)
+        subscriber.start()
+        stream = m_client.return_value.subscribe.return_value
+        stream.cancel.side_effect = lambda: events.append("cancel")
+        callback = m_client.return_value.subscribe.call_args.args[1]
+        message = _message(b"x")
+        message.ack.side_effect = lambda: events.append("ack")
+        callback(message)
+
+        stopper = threading.Thread(target=subscriber.stop)
+        stopper.start()
+        while not subscriber._draining:
+            time.sleep(0.001)
+        late = _message(b"late")
+        callback(late)
+        release.set()
+        stopper.join(timeout=5)
+
+        self.assertEqual(events, ["ack", "cancel"])
+        late.nack.assert_called_once()
+
+
+def _push_event(data, attributes=None, **message):
+    envelope = {
+        "message": {
+            "data": base64.b64encode(data).decode("ascii"),
+            "attributes": attributes or {},
+            "messageId": "123",
+            "publishTime": "2021-02-26T19:13:55.749Z",
+            **message,
+        },
+        "subscription": "projects/p/subscriptions/s",
+        "deliveryAttempt": 2,
+    }
+    return {"body": json.dumps(envelope)}
+
+
+class PushHandlerTests(unittest.TestCase):
+    def test_acks_and_decodes_envelope(self):
+        received = []
+
+        @api.handler
+        @push_handler
+        def handler(record):
+            received.append(record)
+
+        response = handler(_push_event(b'{"foo": "bar"}', {"kind": "test"}), None)
+
+        self.assertEqual(response["statusCode"], 204)
+        record = received[0]
+        self.assertEqual(record.body, {"foo": "bar"})
+        self.assertEqual(record.attributes, {"kind": "test"})
+        self.assertEqual(record.message_id, "123")
+        self.assertEqual(record.delivery_attempt, 2)
+        self.assertEqual(
+            record.publish_time, datetime(2021, 2, 26, 19, 13, 55, 749000, tzinfo=timezone.utc)
+        )
+
+    def test_data_is_decoded_lazily(self):
+        @push_handler
+        def handler(record):
+            pass
+
+        with patch("pubsub.base64.b64decode") as m_b64decode:
+            self.assertEqual(handler(json.loads(_push_event(b"x")["body"])), (204, ""))
+
+        m_b64decode.assert_not_called()
+
+    def test_nacks_on_error(self):
+        @push_handler
+        def handler(record):
+            raise FilteredEvent("skip")
+
+        with self.assertLogs("pubsub", level="WARNING"):
+            status, body = handler(_push_event(b"x")["body"])
+
+        self.assertEqual(status, 500)
+        self.assertEqual(body, {"message": "skip"})
+
+    def test_rejects_malformed_envelope(self):
+        @push_handler
+        def handler(record):
+            pass
+
+        with self.assertLogs("pubsub", level="WARNING"):
+            status, _ = handler({"subscription": "s"})
+
+        self.assertEqual(status, 400)
+
+
+class AsyncPushHandlerTests(unittest.IsolatedAsyncioTestCase):
+    async def test_async_handler(self):
+        received = []
+
+        @api.async_handler
+        @push_handler
+        async def handler(record):
+            received.append(record.body)
+
+        response = await handler(_push_event(b"text", orderingKey="k"), None)
+
+        self.assertEqual(response["statusCode"], 204)
+        self.assertEqual(received, ["text"])
+
+    async def test_async_handler_nacks(self):
+        @push_handler
+        async def handler(record):
+            raise ValueError("boom")
+
+        with self.assertLogs("pubsub", level="ERROR"):
+            status, _ = await handler(_push_event(b"x")["body"])
+
+        self.assertEqual(status, 500)
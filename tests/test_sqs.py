@@ -1,12 +1,22 @@
+import asyncio
+import base64
 import copy
 import json
+import os
+import threading
+import time
 import unittest
 from datetime import datetime
-from unittest.mock import patch
+from unittest.mock import ANY, patch
 from uuid import uuid4
 
+import boto3
+from botocore.stub import Stubber
+
 import sqs
 from sqs import Record, build_message_attributes
+from serpens import codec
+from serpens.idempotency import IdempotencyStore
 from serpens.sentry import FilteredEvent
 
 
@@ -15,9 +25,11 @@ class TestPublishMessage(unittest.TestCase):
         self.patch_boto3 = patch("sqs.boto3")
         self.mock_boto3 = self.patch_boto3.start()
         self.queue_url = "test.fifo"
+        sqs.reset_clients()
 
     def tearDown(self) -> None:
         self.patch_boto3.stop()
+        sqs.reset_clients()
 
     def test_publish_message_succeeded(self):
         queue_url = self.queue_url
@@ -26,7 +38,7 @@ class TestPublishMessage(unittest.TestCase):
 
         sqs.publish_message(queue_url, body, message_group_id)
 
-        self.mock_boto3.client.assert_called_once_with("sqs")
+        self.mock_boto3.client.assert_called_once()
         self.mock_boto3.client.return_value.send_message.assert_called_once_with(
             QueueUrl=queue_url,
             MessageBody='{"message":"my message"}',
@@ -41,7 +53,7 @@ class TestPublishMessage(unittest.TestCase):
 
         sqs.publish_message(queue_url, body, message_group_id)
 
-        self.mock_boto3.client.assert_called_once_with("sqs")
+        self.mock_boto3.client.assert_called_once()
         self.mock_boto3.client.return_value.send_message.assert_called_once_with(
             QueueUrl=queue_url,
             MessageBody='{"message": "my message"}',
@@ -56,7 +68,7 @@ class TestPublishMessage(unittest.TestCase):
 
         sqs.publish_message(queue_url, body, message_group_id)
 
-        self.mock_boto3.client.assert_called_once_with("sqs")
+        self.mock_boto3.client.assert_called_once()
         self.mock_boto3.client.return_value.send_message.assert_called_once_with(
             QueueUrl=queue_url,
             MessageBody='{"message": "my message", "sent_at": "2022-01-01T01:00:00"}',
@@ -71,7 +83,7 @@ class TestPublishMessage(unittest.TestCase):
 
         sqs.publish_message(queue_url, body, message_group_id)
 
-        self.mock_boto3.client.assert_called_once_with("sqs")
+        self.mock_boto3.client.assert_called_once()
         self.mock_boto3.client.return_value.send_message.assert_called_once_with(
             QueueUrl=queue_url,
             MessageBody="try: import antigravity",
@@ -96,7 +108,7 @@ class TestPublishMessage(unittest.TestCase):
         }
         sqs.publish_message(queue_url, body, message_group_id, message_attributes)
 
-        self.mock_boto3.client.assert_called_once_with("sqs")
+        self.mock_boto3.client.assert_called_once()
         self.mock_boto3.client.return_value.send_message.assert_called_once_with(
             QueueUrl=queue_url,
             MessageBody=json.dumps(body),
@@ -105,6 +117,96 @@ class TestPublishMessage(unittest.TestCase):
             MessageAttributes=expected_message_attributes,
         )
 
+    def test_publish_message_reuses_client(self):
+        sqs.publish_message(self.queue_url, "first", "group-test-id")
+        sqs.publish_message(self.queue_url, "second", "group-test-id")
+        sqs.publish_message_batch(self.queue_url, [{"body": "third"}], "group-test-id")
+
+        self.mock_boto3.client.assert_called_once()
+        args, kwargs = self.mock_boto3.client.call_args
+        self.assertEqual(args, ("sqs",))
+        self.assertEqual(kwargs["config"].max_pool_connections, 50)
+        self.assertTrue(kwargs["config"].tcp_keepalive)
+
+    def test_get_client_per_region_and_reset(self):
+        self.mock_boto3.client.side_effect = lambda *args, **kwargs: object()
+
+        default = sqs.get_client()
+        regional = sqs.get_client(region_name="sa-east-1")
+
+        self.assertIs(sqs.get_client(), default)
+        self.assertIsNot(regional, default)
+
+        sqs.reset_clients()
+
+        self.assertIsNot(sqs.get_client(), default)
+
+    @patch.dict("os.environ", {"SQS_PAYLOAD_BUCKET": "payloads"})
+    @patch("sqs.s3")
+    def test_publish_message_offloads_large_body(self, m_s3):
+        body = "x" * (sqs.MAX_MESSAGE_BYTES + 1)
+
+        sqs.publish_message(self.queue_url, body, "group-test-id")
+
+        args, _ = m_s3.upload_object.call_args
+        self.assertEqual(args[0], body.encode("utf-8"))
+        self.assertEqual(args[1], "payloads")
+        params = self.mock_boto3.client.return_value.send_message.call_args.kwargs
+        self.assertEqual(params["MessageBody"], f"s3://payloads/{args[2]}")
+        self.assertEqual(
+            params["MessageAttributes"],
+            {"serpens.payload": {"StringValue": "s3", "DataType": "String"}},
+        )
+
+    @patch.dict("os.environ", {"SQS_PAYLOAD_BUCKET": "payloads"})
+    @patch("sqs.s3")
+    def test_publish_message_keeps_small_body_inline(self, m_s3):
+        sqs.publish_message(self.queue_url, {"foo": "bar"}, "group-test-id")
+
+        m_s3.upload_object.assert_not_called()
+
+    @patch("sqs.s3")
+    def test_publish_message_without_bucket_keeps_large_body(self, m_s3):
+        body = "x" * (sqs.MAX_MESSAGE_BYTES + 1)
+
+        sqs.publish_message(self.queue_url, body, "group-test-id")
+
+        m_s3.upload_object.assert_not_called()
+        params = self.mock_boto3.client.return_value.send_message.call_args.kwargs
+        self.assertEqual(params["MessageBody"], body)
+
+    def test_publish_message_compressed(self):
+        body = {"message": "my message"}
+
+        sqs.publish_message(self.queue_url, body, "group-test-id", compression="gzip")
+
+        params = self.mock_boto3.client.return_value.send_message.call_args.kwargs
+        self.assertEqual(
+            params["MessageAttributes"],
+            {"serpens.encoding": {"StringValue": "gzip", "DataType": "String"}},
+        )
+
+        record = Record(
+            {
+                "body": params["MessageBody"],
+                "messageAttributes": {
+                    "serpens.encoding": {"stringValue": "gzip", "dataType": "String"},
+                },
+                "attributes": {"SentTimestamp": "1627916182931"},
+            }
+        )
+        self.assertEqual(record.body, body)
+
+    @patch.dict("os.environ", {"SQS_COMPRESSION": "zlib"})
+    def test_publish_message_batch_compression_from_env(self):
+        sqs.publish_message_batch(self.queue_url, [{"body": "message 1"}])
+
+        entries = self.mock_boto3.client.return_value.send_message_batch.call_args.kwargs["Entries"]
+        self.assertEqual(entries[0]["MessageAttributes"]["serpens.encoding"]["StringValue"], "zlib")
+        self.assertEqual(
+            codec.decompress(base64.b64decode(entries[0]["MessageBody"]), "zlib"), b"message 1"
+        )
+
 
 class TestSQSHandler(unittest.TestCase):
     @classmethod
@@ -141,12 +243,9 @@ class TestSQSHandler(unittest.TestCase):
         self.assertEqual(record.body["foo"], "bar")
 
     def test_handler_exception(self):
-        record = None
-
         @sqs.handler
         def handler(message: Record):
-            nonlocal record
-            record = message
+            return message.sent_datetime
 
         event = {"Records": [{"foo": "bar"}]}
 
@@ -189,6 +288,278 @@ class TestSQSHandler(unittest.TestCase):
         self.assertEqual("Error", str(err.exception))
 
 
+def _records(count, group_id=None):
+    records = []
+    for index in range(count):
+        attributes = {"SentTimestamp": "1627916182931"}
+        if group_id is not None:
+            attributes["MessageGroupId"] = group_id
+        records.append({"messageId": f"id-{index}", "body": str(index), "attributes": attributes})
+    return records
+
+
+@patch.dict("os.environ", {"CLOUD_PROVIDER": "aws"})
+class TestSQSConcurrentHandler(unittest.TestCase):
+    def test_records_run_concurrently(self):
+        barrier = threading.Barrier(3, timeout=2)
+
+        @sqs.handler(max_workers=3)
+        def handler(message: Record):
+            barrier.wait()
+
+        self.assertIsNone(handler({"Records": _records(3)}, None))
+
+    def test_fifo_group_keeps_order(self):
+        seen = []
+
+        @sqs.handler(max_workers=4)
+        def handler(message: Record):
+            time.sleep(0.001 * (5 - message.body))
+            seen.append(message.body)
+
+        handler({"Records": _records(5, group_id="g1")}, None)
+
+        self.assertEqual(seen, [0, 1, 2, 3, 4])
+
+    def test_batch_item_failures(self):
+        @sqs.handler(max_workers=4)
+        def handler(message: Record):
+            if message.body % 2:
+                raise FilteredEvent("odd")
+
+        result = handler({"Records": _records(6)}, None)
+
+        failures = sorted(item["itemIdentifier"] for item in result["batchItemFailures"])
+        self.assertEqual(failures, ["id-1", "id-3", "id-5"])
+
+    @patch.dict("os.environ", {"SQS_HANDLER_MAX_WORKERS": "4"})
+    def test_error_is_raised(self):
+        @sqs.handler
+        def handler(message: Record):
+            if message.body == 2:
+                raise ValueError("boom")
+
+        with self.assertRaisesRegex(ValueError, "boom"):
+            handler({"Records": _records(4)}, None)
+
+
+@patch.dict("os.environ", {"CLOUD_PROVIDER": "aws"})
+class TestSQSPartialFailures(unittest.TestCase):
+    def test_errors_are_reported_per_record(self):
+        processed = []
+
+        @sqs.handler(partial_failures=True)
+        def handler(message: Record):
+            if message.body == 1:
+                raise ValueError("boom")
+            processed.append(message.body)
+
+        result = handler({"Records": _records(3)}, None)
+
+        self.assertEqual(result, {"batchItemFailures": [{"itemIdentifier": "id-1"}]})
+        self.assertEqual(processed, [0, 2])
+
+    @patch.dict("os.environ", {"SQS_HANDLER_PARTIAL_FAILURES": "true"})
+    def test_fifo_group_stops_after_failure(self):
+        processed = []
+        records = _records(4, group_id="g1") + [
+            {"messageId": "other", "body": "9", "attributes": {"MessageGroupId": "g2"}}
+        ]
+
+        @sqs.handler
+        def handler(message: Record):
+            if message.body == 1:
+                raise ValueError("boom")
+            processed.append(message.body)
+
+        result = handler({"Records": records}, None)
+
+        failures = [item["itemIdentifier"] for item in result["batchItemFailures"]]
+        self.assertEqual(failures, ["id-1", "id-2", "id-3"])
+        self.assertEqual(processed, [0, 9])
+
+    def test_async_errors_are_reported_per_record(self):
+        @sqs.async_handler(partial_failures=True)
+        async def handler(message: Record):
+            if message.body == 0:
+                raise ValueError("boom")
+
+        result = handler({"Records": _records(2)}, None)
+
+        self.assertEqual(result, {"batchItemFailures": [{"itemIdentifier": "id-0"}]})
+
+    @patch.dict("os.environ", {"CLOUD_PROVIDER": "gcp"})
+    def test_errors_are_raised_outside_aws(self):
+        @sqs.handler(partial_failures=True)
+        def handler(message: Record):
+            raise ValueError("boom")
+
+        with self.assertRaisesRegex(ValueError, "boom"):
+            handler({"Records": _records(1)}, None)
+
+
+class _LambdaContext:
+    def __init__(self, remaining):
+        self.remaining = list(remaining)
+
+    def get_remaining_time_in_millis(self):
+        return self.remaining.pop(0) if len(self.remaining) > 1 else self.remaining[0]
+
+
+@patch.dict("os.environ", {"CLOUD_PROVIDER": "aws"})
+class TestSQSTimeBudget(unittest.TestCase):
+    def test_stops_starting_records_near_timeout(self):
+        processed = []
+
+        @sqs.handler(time_margin_ms=5000)
+        def handler(message: Record):
+            processed.append(message.body)
+
+        context = _LambdaContext([9000, 7000, 4000])
+        result = handler({"Records": _records(4)}, context)
+
+        self.assertEqual(processed, [0, 1])
+        failures = [item["itemIdentifier"] for item in result["batchItemFailures"]]
+        self.assertEqual(failures, ["id-2", "id-3"])
+
+    @patch.dict("os.environ", {"SQS_HANDLER_TIME_MARGIN_MS": "5000"})
+    def test_async_stops_starting_records_near_timeout(self):
+        processed = []
+
+        @sqs.async_handler(max_concurrency=1)
+        async def handler(message: Record):
+            processed.append(message.body)
+
+        result = handler({"Records": _records(3)}, _LambdaContext([9000, 1000]))
+
+        self.assertEqual(processed, [0])
+        self.assertEqual(len(result["batchItemFailures"]), 2)
+
+    def test_disabled_without_margin_or_lambda_context(self):
+        processed = []
+
+        @sqs.handler
+        def handler(message: Record):
+            processed.append(message.body)
+
+        handler({"Records": _records(2)}, _LambdaContext([0]))
+        handler({"Records": _records(2)}, {"nothing": "here"})
+
+        self.assertEqual(processed, [0, 1, 0, 1])
+
+
+@patch.dict("os.environ", {"CLOUD_PROVIDER": "aws"})
+class TestSQSIdempotency(unittest.TestCase):
+    def test_duplicates_are_skipped(self):
+        processed = []
+        store = IdempotencyStore()
+
+        @sqs.handler(idempotency=store)
+        def handler(message: Record):
+            processed.append(message.body)
+
+        handler({"Records": _records(2)}, None)
+        handler({"Records": _records(3)}, None)
+
+        self.assertEqual(processed, [0, 1, 2])
+
+    def test_failed_records_are_not_marked(self):
+        attempts = []
+        store = IdempotencyStore()
+
+        @sqs.handler(idempotency=store, idempotency_key=lambda record: f"key-{record.body}")
+        def handler(message: Record):
+            attempts.append(message.body)
+            if len(attempts) == 1:
+                raise FilteredEvent("retry me")
+
+        handler({"Records": _records(1)}, None)
+        handler({"Records": _records(1)}, None)
+        handler({"Records": _records(1)}, None)
+
+        self.assertEqual(attempts, [0, 0])
+        self.assertTrue(store.seen("key-0"))
+
+    def test_async_duplicates_are_skipped(self):
+        processed = []
+        store = IdempotencyStore()
+
+        @sqs.async_handler(idempotency=store)
+        async def handler(message: Record):
+            processed.append(message.body)
+
+        handler({"Records": _records(2)}, None)
+        handler({"Records": _records(2)}, None)
+
+        self.assertEqual(processed, [0, 1])
+
+
+@patch.dict("os.environ", {"CLOUD_PROVIDER": "aws"})
+class TestSQSAsyncHandler(unittest.TestCase):
+    def test_records_share_persistent_loop(self):
+        loops = []
+
+        @sqs.async_handler
+        async def handler(message: Record):
+            loops.append(asyncio.get_running_loop())
+
+        handler({"Records": _records(3)}, None)
+        handler({"Records": _records(2)}, None)
+
+        self.assertEqual(len(loops), 5)
+        self.assertEqual(len(set(map(id, loops))), 1)
+
+    def test_concurrency_is_bounded(self):
+        in_flight = 0
+        peak = 0
+
+        @sqs.async_handler(max_concurrency=3)
+        async def handler(message: Record):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+
+        handler({"Records": _records(10)}, None)
+
+        self.assertEqual(peak, 3)
+
+    def test_fifo_group_keeps_order(self):
+        seen = []
+
+        @sqs.async_handler
+        async def handler(message: Record):
+            await asyncio.sleep(0.001 * (5 - message.body))
+            seen.append(message.body)
+
+        handler({"Records": _records(5, group_id="g1")}, None)
+
+        self.assertEqual(seen, [0, 1, 2, 3, 4])
+
+    def test_batch_item_failures(self):
+        @sqs.async_handler
+        async def handler(message: Record):
+            if message.body == 1:
+                raise FilteredEvent("filtered")
+            if message.body == 2:
+                return {"messageId": "id-2"}
+
+        result = handler({"Records": _records(3)}, None)
+
+        self.assertEqual(
+            result, {"batchItemFailures": [{"itemIdentifier": "id-1"}, {"itemIdentifier": "id-2"}]}
+        )
+
+    def test_error_is_raised(self):
+        @sqs.async_handler
+        async def handler(message: Record):
+            raise ValueError("boom")
+
+        with self.assertRaisesRegex(ValueError, "boom"):
+            handler({"Records": _records(2)}, None)
+
+
 class TestSQSRecord(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
@@ -244,6 +615,24 @@ class TestSQSRecord(unittest.TestCase):
         self.assertEqual(record.data["awsRegion"], data["awsRegion"])
         self.assertEqual(record.data["attributes"], data["attributes"])
 
+    @patch.object(Record, "_decode_body", return_value={"foo": "bar"})
+    def test_record_decodes_lazily_and_caches(self, m_decode):
+        record = Record({"body": '{"foo":"bar"}', "messageAttributes": {"a": {}}})
+
+        self.assertEqual(record.message_attributes, {"a": {}})
+        m_decode.assert_not_called()
+
+        self.assertEqual(record.body, {"foo": "bar"})
+        self.assertEqual(record.body, {"foo": "bar"})
+        m_decode.assert_called_once()
+
+    def test_record_uses_slots(self):
+        record = Record(self.event["Records"][0])
+
+        self.assertFalse(hasattr(record, "__dict__"))
+        with self.assertRaises(KeyError):
+            Record({"body": "x"}).sent_datetime
+
     def test_create_record_with_body_as_str(self):
         self.event["Records"][0]["body"] = "some value"
         data = self.event["Records"][0]
@@ -251,6 +640,24 @@ class TestSQSRecord(unittest.TestCase):
 
         self.assertEqual(record.body, data["body"])
 
+    @patch("sqs.s3")
+    def test_offloaded_body_is_loaded_on_access(self, m_s3):
+        m_s3.get_object.return_value.read.return_value = b'{"big": "payload"}'
+        data = {
+            "body": "s3://payloads/sqs-payloads/abc",
+            "messageAttributes": {
+                "serpens.payload": {"stringValue": "s3", "dataType": "String"},
+            },
+            "attributes": {"SentTimestamp": "1627916182931"},
+        }
+
+        record = Record(data)
+        m_s3.get_object.assert_not_called()
+
+        self.assertEqual(record.body, {"big": "payload"})
+        self.assertEqual(record.body, {"big": "payload"})
+        m_s3.get_object.assert_called_once_with("payloads", "sqs-payloads/abc")
+
 
 class TestPublishMessageBatch(unittest.TestCase):
     def setUp(self) -> None:
@@ -281,9 +688,11 @@ class TestPublishMessageBatch(unittest.TestCase):
         ]
 
         self.queue_url = "test.fifo"
+        sqs.reset_clients()
 
     def tearDown(self) -> None:
         self.patch_boto3.stop()
+        sqs.reset_clients()
 
     def test_publish_message_batch_succeeded(self):
         response = self.response
@@ -393,6 +802,343 @@ class TestPublishMessageBatch(unittest.TestCase):
         self.assertEqual(len(response), 1)
         self.assertEqual(len(response[0]["Failed"]), 2)
 
+    def test_publish_message_batch_concurrent_keeps_input_order(self):
+        messages = [{"body": f"message {i}"} for i in range(45)]
+
+        def send_message_batch(**params):
+            if params["Entries"][0]["MessageBody"] == "message 0":
+                time.sleep(0.02)
+            return {"Bodies": [entry["MessageBody"] for entry in params["Entries"]]}
+
+        mock_publish_message_batch = self.mock_boto3.client.return_value.send_message_batch
+        mock_publish_message_batch.side_effect = send_message_batch
+
+        result = sqs.publish_message_batch("test", messages, max_workers=4)
+
+        self.assertEqual(mock_publish_message_batch.call_count, 5)
+        bodies = [body for response in result for body in response["Bodies"]]
+        self.assertEqual(bodies, [message["body"] for message in messages])
+
+    @patch("sqs.ThreadPoolExecutor")
+    def test_publish_message_batch_fifo_is_sequential(self, m_executor):
+        messages = [{"body": f"message {i}"} for i in range(30)]
+
+        result = sqs.publish_message_batch(self.queue_url, messages, "group", max_workers=4)
+
+        m_executor.assert_not_called()
+        self.assertEqual(len(result), 3)
+
+    def test_publish_message_batch_splits_by_payload_size(self):
+        large = "x" * (100 * 1024)
+        messages = [{"body": large, "attributes": {"key": "value"}} for _ in range(5)]
+        messages.append({"body": "small"})
+
+        mock_publish_message_batch = self.mock_boto3.client.return_value.send_message_batch
+
+        result = sqs.publish_message_batch(self.queue_url, messages)
+
+        self.assertEqual(len(result), 3)
+        sizes = [len(c.kwargs["Entries"]) for c in mock_publish_message_batch.call_args_list]
+        self.assertEqual(sizes, [2, 2, 2])
+        for call in mock_publish_message_batch.call_args_list:
+            payload = sum(sqs._entry_size(entry) for entry in call.kwargs["Entries"])
+            self.assertLessEqual(payload, sqs.MAX_BATCH_BYTES)
+
+    def test_entry_size_counts_attributes(self):
+        entry = {
+            "MessageBody": "açaí",
+            "MessageAttributes": {
+                "s": {"StringValue": "abc", "DataType": "String"},
+                "n": {"StringValue": 12, "DataType": "Number"},
+                "b": {"BinaryValue": b"\x00\x01", "DataType": "Binary"},
+            },
+        }
+
+        self.assertEqual(sqs._entry_size(entry), 6 + (1 + 6 + 3) + (1 + 6 + 2) + (1 + 6 + 2))
+
+    @patch("sqs.time.sleep")
+    def test_publish_message_batch_retries_only_failed_entries(self, m_sleep):
+        messages = [{"body": f"message {i}"} for i in range(3)]
+        throttled = {"Id": "1", "SenderFault": False, "Code": "ThrottlingException"}
+        invalid = {"Id": "2", "SenderFault": True, "Code": "InvalidMessageContents"}
+
+        mock_publish_message_batch = self.mock_boto3.client.return_value.send_message_batch
+        mock_publish_message_batch.side_effect = [
+            {"Successful": [{"Id": "0", "MessageId": "m0"}], "Failed": [throttled, invalid]},
+            {"Successful": [{"Id": "1", "MessageId": "m1"}], "Failed": []},
+        ]
+
+        result = sqs.publish_message_batch(self.queue_url, messages)
+
+        self.assertEqual(mock_publish_message_batch.call_count, 2)
+        retried = mock_publish_message_batch.call_args.kwargs["Entries"]
+        self.assertEqual(retried, [{"Id": "1", "MessageBody": "message 1"}])
+        m_sleep.assert_called_once()
+        self.assertEqual(len(result), 1)
+        self.assertEqual([item["Id"] for item in result[0]["Successful"]], ["0", "1"])
+        self.assertEqual(result[0]["Failed"], [invalid])
+
+    @patch("sqs.time.sleep")
+    def test_publish_message_batch_retry_budget_exhausted(self, m_sleep):
+        throttled = {"Id": "0", "SenderFault": False, "Code": "ThrottlingException"}
+
+        mock_publish_message_batch = self.mock_boto3.client.return_value.send_message_batch
+        mock_publish_message_batch.return_value = {"Successful": [], "Failed": [throttled]}
+
+        result = sqs.publish_message_batch(self.queue_url, [{"body": "x"}], max_attempts=4)
+
+        self.assertEqual(mock_publish_message_batch.call_count, 4)
+        self.assertEqual(m_sleep.call_count, 3)
+        self.assertEqual(result[0]["Failed"], [throttled])
+
+    def test_publish_message_batch_rejects_zero_attempts(self):
+        with self.assertRaises(ValueError):
+            sqs.publish_message_batch(self.queue_url, [{"body": "x"}], max_attempts=0)
+
+        self.mock_boto3.client.return_value.send_message_batch.assert_not_called()
+
+    def test_publish_message_batch_fifo_passes_boto3_validation(self):
+        client = boto3.client(
+            "sqs",
+            region_name="us-east-1",
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+        )
+        queue_url = "https://sqs.us-east-1.amazonaws.com/123456789012/orders.fifo"
+        stubber = Stubber(client)
+        stubber.add_response(
+            "send_message_batch",
+            {"Successful": [], "Failed": []},
+            {
+                "QueueUrl": queue_url,
+                "Entries": [
+                    {
+                        "Id": str(index),
+                        "MessageBody": f"message {index}",
+                        "MessageGroupId": "group",
+                        "MessageDeduplicationId": ANY,
+                    }
+                    for index in range(2)
+                ],
+            },
+        )
+
+        with stubber, patch("sqs.get_client", return_value=client):
+            sqs.publish_message_batch(
+                queue_url, [{"body": "message 0"}, {"body": "message 1"}], "group"
+            )
+
+        stubber.assert_no_pending_responses()
+
+    def test_publish_message_batch_fifo_dedup_ids_are_unique(self):
+        sqs.publish_message_batch(self.queue_url, [{"body": "same"}, {"body": "same"}], "group")
+
+        entries = self.mock_boto3.client.return_value.send_message_batch.call_args.kwargs["Entries"]
+        self.assertEqual(len({entry["MessageDeduplicationId"] for entry in entries}), 2)
+
+
+def _received(index, group_id=None):
+    attributes = {"SentTimestamp": "1627916182931"}
+    if group_id is not None:
+        attributes["MessageGroupId"] = group_id
+    return {
+        "MessageId": f"id-{index}",
+        "ReceiptHandle": f"rh-{index}",
+        "Body": json.dumps(index),
+        "Attributes": attributes,
+        "MessageAttributes": {"kind": {"StringValue": "test", "DataType": "String"}},
+    }
+
+
+@patch.dict("os.environ", {"CLOUD_PROVIDER": "aws"})
+class TestConsumer(unittest.TestCase):
+    queue_url = "https://sqs.us-east-1.amazonaws.com/123456789012/jobs"
+
+    def setUp(self):
+        self.patch_boto3 = patch("sqs.boto3")
+        self.mock_boto3 = self.patch_boto3.start()
+        self.client = self.mock_boto3.client.return_value
+        self.client.delete_message_batch.return_value = {"Successful": [], "Failed": []}
+        sqs.reset_clients()
+
+    def tearDown(self):
+        self.patch_boto3.stop()
+        sqs.reset_clients()
+
+    def _receive(self, *batches):
+        batches = list(batches)
+
+        def receive_message(**params):
+            if batches:
+                return {"Messages": batches.pop(0)}
+            time.sleep(0.01)
+            return {}
+
+        self.client.receive_message.side_effect = receive_message
+
+    def _deleted(self):
+        return [
+            entry["ReceiptHandle"]
+            for call in self.client.delete_message_batch.call_args_list
+            for entry in call.kwargs["Entries"]
+        ]
+
+    def test_processes_and_acknowledges_in_batches(self):
+        self._receive([_received(i) for i in range(10)], [_received(i) for i in range(10, 15)])
+        processed = []
+        done = threading.Event()
+
+        def process(record: Record):
+            self.assertEqual(record.queue_name, "jobs")
+            self.assertEqual(record.message_attributes["kind"]["stringValue"], "test")
+            processed.append(record.body)
+            if len(processed) == 15:
+                done.set()
+
+        consumer = sqs.Consumer(self.queue_url, process, pollers=2, max_workers=4)
+        consumer.start()
+        self.assertTrue(done.wait(2))
+        consumer.stop()
+
+        self.assertEqual(sorted(processed), list(range(15)))
+        self.assertEqual(sorted(self._deleted()), sorted(f"rh-{i}" for i in range(15)))
+        for call in self.client.delete_message_batch.call_args_list:
+            self.assertLessEqual(len(call.kwargs["Entries"]), 10)
+        params = self.client.receive_message.call_args.kwargs
+        self.assertEqual(params["MaxNumberOfMessages"], 10)
+        self.assertEqual(params["QueueUrl"], self.queue_url)
+
+    def test_failed_messages_are_not_deleted(self):
+        self._receive([_received(0), _received(1), _received(2, "g"), _received(3, "g")])
+        done = threading.Event()
+        seen = []
+
+        def process(record: Record):
+            seen.append(record.body)
+            if record.body == 0:
+                raise FilteredEvent("filtered")
+            if record.body == 2:
+                raise ValueError("boom")
+            done.set()
+
+        consumer = sqs.Consumer(self.queue_url, process, max_workers=2)
+        consumer.start()
+        self.assertTrue(done.wait(2))
+        consumer.stop()
+
+        self.assertEqual(self._deleted(), ["rh-1"])
+        self.assertNotIn(3, seen)
+
+    def test_extends_visibility_of_stale_messages(self):
+        consumer = sqs.Consumer(self.queue_url, lambda record: None, visibility_timeout=30)
+        now = time.monotonic()
+        consumer._inflight = {"old": now - 20, "new": now}
+
+        consumer._extend_visibility()
+
+        self.client.change_message_visibility_batch.assert_called_once_with(
+            QueueUrl=self.queue_url,
+            Entries=[{"Id": "0", "ReceiptHandle": "old", "VisibilityTimeout": 30}],
+        )
+        self.assertGreater(consumer._inflight["old"], now)
+
+    def test_queue_arn(self):
+        self.assertEqual(sqs._queue_arn(self.queue_url), "arn:aws:sqs:us-east-1:123456789012:jobs")
+
+
+def _echo_batch(**params):
+    return {
+        "Successful": [
+            {"Id": entry["Id"], "MessageId": f"mid-{entry['MessageBody']}"}
+            for entry in params["Entries"]
+        ],
+        "Failed": [],
+    }
+
+
+class TestAsyncSQSPublisher(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.patch_boto3 = patch("sqs.boto3")
+        self.mock_boto3 = self.patch_boto3.start()
+        self.client = self.mock_boto3.client.return_value
+        self.client.send_message_batch.side_effect = _echo_batch
+        sqs.reset_clients()
+
+    def tearDown(self):
+        self.patch_boto3.stop()
+        sqs.reset_clients()
+
+    async def test_publishes_are_batched_and_resolved_individually(self):
+        publisher = sqs.AsyncSQSPublisher(linger_ms=20)
+
+        message_ids = await asyncio.gather(
+            *(publisher.publish("queue", f"m{i}") for i in range(25))
+        )
+
+        self.assertEqual(message_ids, [f"mid-m{i}" for i in range(25)])
+        sizes = [len(c.kwargs["Entries"]) for c in self.client.send_message_batch.call_args_list]
+        self.assertEqual(sizes, [10, 10, 5])
+
+    async def test_failed_entry_raises(self):
+        self.client.send_message_batch.side_effect = None
+        self.client.send_message_batch.return_value = {
+            "Successful": [],
+            "Failed": [{"Id": "0", "SenderFault": True, "Code": "Invalid", "Message": "bad"}],
+        }
+        publisher = sqs.AsyncSQSPublisher(linger_ms=1)
+
+        with self.assertRaisesRegex(sqs.PublishError, "Invalid: bad"):
+            await publisher.publish("queue", {"foo": "bar"})
+
+    async def test_fifo_entries_carry_group(self):
+        publisher = sqs.AsyncSQSPublisher(linger_ms=1)
+
+        await asyncio.gather(
+            publisher.publish("queue.fifo", "a", message_group_id="g1"),
+            publisher.publish("queue.fifo", "b", message_group_id="g2"),
+        )
+
+        self.assertEqual(self.client.send_message_batch.call_count, 2)
+        for call in self.client.send_message_batch.call_args_list:
+            entry = call.kwargs["Entries"][0]
+            self.assertIn(entry["MessageGroupId"], ("g1", "g2"))
+        self.assertEqual(publisher._locks, {})
+
+    async def test_fifo_entries_of_one_group_get_distinct_dedup_ids(self):
+        publisher = sqs.AsyncSQSPublisher(linger_ms=1)
+
+        await asyncio.gather(
+            *(publisher.publish("queue.fifo", f"m{i}", message_group_id="g") for i in range(3))
+        )
+
+        entries = self.client.send_message_batch.call_args.kwargs["Entries"]
+        self.assertEqual([entry["MessageBody"] for entry in entries], ["m0", "m1", "m2"])
+        self.assertEqual(len({entry["MessageDeduplicationId"] for entry in entries}), 3)
+
+    @patch.dict(os.environ, {"SQS_PAYLOAD_BUCKET": "payloads"})
+    @patch("sqs.s3.upload_object", return_value=True)
+    async def test_offload_runs_off_the_event_loop(self, m_upload):
+        loop_thread = threading.get_ident()
+        threads = []
+        m_upload.side_effect = lambda *args: threads.append(threading.get_ident()) or True
+        publisher = sqs.AsyncSQSPublisher(linger_ms=1)
+
+        await publisher.publish("queue", "x" * (sqs.MAX_MESSAGE_BYTES + 1))
+
+        self.assertEqual(len(threads), 1)
+        self.assertNotEqual(threads[0], loop_thread)
+        entry = self.client.send_message_batch.call_args.kwargs["Entries"][0]
+        self.assertTrue(entry["MessageBody"].startswith("s3://payloads/"))
+
+    async def test_close_flushes_buffer(self):
+        publisher = sqs.AsyncSQSPublisher(linger_ms=60_000)
+
+        task = asyncio.ensure_future(publisher.publish("queue", "late"))
+        await asyncio.sleep(0)
+        await publisher.close()
+
+        self.assertEqual(await task, "mid-late")
+
 
 class TestBuildAttributesFunction(unittest.TestCase):
     def test_build_message_attributes(self):